@@ -0,0 +1,693 @@
+"""Cálculos do dashboard que não dependem do Streamlit.
+
+Usados pelo app e pela linha de comando (batch.py), para que os dois
+produzam exatamente os mesmos números.
+"""
+import numpy as np
+import pandas as pd
+
+from profiler import profile_columns
+
+# Chaves de vínculo entre ControleDiario e pxGetWorkHistory
+COL_CHAVE_CD   = "Chave de manipulação de instâncias"
+COL_CHAVE_HIST = "Histórico de"
+
+# Atributos do histórico mostrados no resumo das chaves sem operação
+HIST_FIRST_COLS = ["Tipo de Caso/Suporte", "Nome da Tarefa", "Executante", "Criar hora"]
+
+
+def encode_keys(df_cd: pd.DataFrame, df_hist: pd.DataFrame,
+                col_cd: str = COL_CHAVE_CD, col_hist: str = COL_CHAVE_HIST) -> dict:
+    """Chaves dos dois arquivos (texto, sem espaços) num dicionário comum de inteiros.
+
+    Devolve {"cd": códigos das operações, "hist": códigos do histórico,
+    "chaves": Index com o texto de cada código}. Cruzamentos, anti-joins e
+    contagens por chave rodam sobre esses arrays int32 em vez de texto.
+    """
+    canon = [df[col].astype(str).str.strip().to_numpy() for df, col in ((df_cd, col_cd), (df_hist, col_hist))]
+    codes, chaves = pd.factorize(np.concatenate(canon))
+    codes = codes.astype(np.int32)
+    return {"cd": codes[:len(df_cd)], "hist": codes[len(df_cd):], "chaves": pd.Index(chaves)}
+
+
+def merge_history_counts(df_cd: pd.DataFrame, df_hist: pd.DataFrame,
+                         col_cd: str = COL_CHAVE_CD, col_hist: str = COL_CHAVE_HIST,
+                         keys: dict = None) -> pd.DataFrame:
+    """Acrescenta às operações a coluna "Qtd Histórico" (nº de eventos por chave)."""
+    if keys is None:
+        keys = encode_keys(df_cd, df_hist, col_cd, col_hist)
+    counts = np.bincount(keys["hist"], minlength=len(keys["chaves"]))
+    return df_cd.assign(**{"Qtd Histórico": counts[keys["cd"]].astype(int)})
+
+
+def link_validation(df_cd: pd.DataFrame, df_hist: pd.DataFrame,
+                    col_cd: str = COL_CHAVE_CD, col_hist: str = COL_CHAVE_HIST,
+                    keys: dict = None) -> dict:
+    """Relatório de vínculo entre os dois arquivos.
+
+    `df_cd` precisa já ter "Qtd Histórico" (ver merge_history_counts).
+    Devolve as operações sem histórico, as linhas do histórico sem operação,
+    um resumo com uma linha por chave do histórico não encontrada, a contagem
+    de registros por chave do histórico e os conjuntos de chaves vinculadas e
+    não vinculadas.
+    """
+    if keys is None:
+        keys = encode_keys(df_cd, df_hist, col_cd, col_hist)
+    chaves = keys["chaves"]
+    ops_sem_hist = df_cd[df_cd["Qtd Histórico"].to_numpy() == 0]
+
+    in_cd = np.zeros(len(chaves), dtype=bool)
+    in_cd[keys["cd"]] = True
+    mask_hist_sem = ~in_cd[keys["hist"]]
+    hist_sem_op   = df_hist[mask_hist_sem]
+
+    counts = np.bincount(keys["hist"], minlength=len(chaves))
+    contagem_por_chave = pd.Series(counts, index=chaves)[counts > 0].sort_values(ascending=False, kind="stable")
+
+    # Uma linha por chave única, com contagem de linhas e primeiros valores
+    first_cols = [c for c in HIST_FIRST_COLS if c in hist_sem_op.columns and c != col_hist]
+    codes_sem = keys["hist"][mask_hist_sem]
+    grouped = hist_sem_op[first_cols].groupby(codes_sem)
+    resumo = grouped.first()
+    resumo.insert(0, "Qtd linhas no Histórico", counts[resumo.index])
+    resumo.insert(0, "Chave do Caso (no Histórico)", chaves.take(resumo.index))
+    resumo = (
+        resumo.sort_values(["Qtd linhas no Histórico", "Chave do Caso (no Histórico)"],
+                           ascending=[False, True])
+        .reset_index(drop=True)
+    )
+
+    return {
+        "ops_sem_hist": ops_sem_hist,
+        "hist_sem_op": hist_sem_op,
+        "resumo_hist_sem_op": resumo,
+        "n_chaves_hist_sem": int(len(resumo)),
+        "chaves_hist_sem": resumo["Chave do Caso (no Histórico)"],
+        "chaves_vinculadas": chaves[in_cd & (counts > 0)],
+        "contagem_por_chave": contagem_por_chave,
+    }
+
+
+def column_quality(df: pd.DataFrame, profile: pd.DataFrame = None) -> pd.DataFrame:
+    """Estatísticas de qualidade por coluna (nulos, únicos, preenchidos), lidas do
+    perfil de colunas (profiler.profile_columns). "Únicos aprox." marca as
+    colunas cujo nº de únicos é estimativa HyperLogLog."""
+    if profile is None:
+        profile = profile_columns(df)
+    return profile[["Coluna", "Tipo", "Nulos", "% Nulos", "Únicos", "Únicos aprox.", "Preenchidos"]]
+
+
+def history_per_operation(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST) -> pd.DataFrame:
+    """Contagem de registros de histórico por operação, da maior para a menor."""
+    hist_por_op_df = df_hist[col_hist].value_counts().reset_index()
+    hist_por_op_df.columns = ["Operação", "Qtd. Registros de Histórico"]
+    hist_por_op_df["Índice"] = range(1, len(hist_por_op_df) + 1)
+    return hist_por_op_df
+
+
+# Prefixo das colunas de contagem por tarefa em case_lifecycle
+LIFECYCLE_TASK_PREFIX = "Qtd. "
+
+
+def _case_events(df_hist: pd.DataFrame, col_hist: str, col_time: str, keys: dict = None) -> tuple:
+    """Eventos com chave ordenados por (chave, data), NaT no fim de cada chave
+    → (posições em df_hist, códigos das chaves, datas, Index das chaves)."""
+    if keys is not None:
+        codes, uniques = keys["hist"], keys["chaves"]
+    else:
+        codes, uniques = pd.factorize(df_hist[col_hist], sort=False)
+    rows = np.flatnonzero(codes >= 0)
+    t = (pd.to_datetime(df_hist[col_time], errors="coerce").to_numpy()[rows] if col_time in df_hist.columns
+         else np.full(len(rows), np.datetime64("NaT"), dtype="datetime64[ns]"))
+    c = codes[rows]
+    order = np.lexsort((t, c))
+    return rows[order], c[order], t[order], uniques
+
+
+def case_lifecycle(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+                   col_time: str = "Criar hora", col_task: str = "Nome da Tarefa",
+                   col_exec: str = "Executante", keys: dict = None) -> pd.DataFrame:
+    """Ciclo de vida de todos os casos do histórico, numa passada vetorizada.
+
+    Uma linha por chave: primeiro e último evento (data e tarefa), duração
+    total, maior intervalo e intervalo médio entre eventos consecutivos (em
+    horas), executantes distintos e a contagem de eventos por tarefa
+    ("Qtd. <tarefa>"). O índice é o código da chave (ver encode_keys), para que
+    as operações recebam os valores com `.reindex(keys["cd"])`.
+    """
+    rows, c, t, uniques = _case_events(df_hist, col_hist, col_time, keys)
+    has = {col: col in df_hist.columns for col in (col_task, col_exec)}
+    events = pd.DataFrame({"_k": c, "_t": t})
+    if has[col_task]:
+        events["_task"] = df_hist[col_task].to_numpy()[rows]
+    if has[col_exec]:
+        events["_exec"] = df_hist[col_exec].to_numpy()[rows]
+
+    g = events.groupby("_k", sort=True)
+    out = pd.DataFrame({"Eventos": g.size(), "Primeiro evento": g["_t"].min(), "Último evento": g["_t"].max()})
+    if has[col_task]:
+        out["Primeira tarefa"] = g["_task"].first()
+        out["Última tarefa"] = g["_task"].last()
+
+    hour = np.timedelta64(1, "h")
+    out["Duração total (h)"] = (out["Último evento"] - out["Primeiro evento"]) / hour
+    same = c[1:] == c[:-1]
+    gaps = pd.Series((t[1:] - t[:-1])[same] / hour).groupby(c[1:][same])
+    out["Maior intervalo (h)"] = gaps.max()
+    out["Intervalo médio (h)"] = gaps.mean()
+
+    if has[col_exec]:
+        out["Executantes distintos"] = g["_exec"].nunique()
+    if has[col_task]:
+        per_task = events.groupby(["_k", "_task"], observed=True).size().unstack(fill_value=0)
+        per_task.columns = [f"{LIFECYCLE_TASK_PREFIX}{task}" for task in per_task.columns]
+        out = out.join(per_task)
+        out[per_task.columns] = out[per_task.columns].fillna(0).astype(int)
+
+    out.insert(0, "Operação", uniques.take(out.index.to_numpy()))
+    out.index.name = None
+    return out
+
+
+# ── Mapa de processo (grafo "directly-follows") ─────────────────────────────
+PROCESS_START, PROCESS_END = "▶ Início", "■ Fim"
+# Variantes (caminhos) mais frequentes devolvidas com o texto do caminho
+PROCESS_TOP_VARIANTS = 20
+
+
+def _path_hash(task_codes: np.ndarray, pos: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Σ (tarefa + 1)·B^posição por caso, em uint64 (estoura de propósito)."""
+    powers = np.cumprod(np.full(int(pos.max()) + 1, 1_000_003, dtype=np.uint64))
+    with np.errstate(over="ignore"):
+        return np.add.reduceat((task_codes.astype(np.uint64) + np.uint64(1)) * powers[pos], starts)
+
+
+def process_map(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+                col_time: str = "Criar hora", col_task: str = "Nome da Tarefa",
+                keys: dict = None, top_variants: int = PROCESS_TOP_VARIANTS) -> dict:
+    """Transições entre tarefas consecutivas de cada caso e frequência dos caminhos.
+
+    Sobre o histórico ordenado por (caso, data): cada par de eventos vizinhos do
+    mesmo caso é uma transição De → Para (mais Início → primeira tarefa e
+    última tarefa → Fim). Devolve:
+
+    - "transicoes": De, Para, Transições, Casos e mediana de horas entre os eventos;
+    - "variantes": os `top_variants` caminhos mais frequentes, com casos e % dos casos;
+    - "n_variantes": nº de caminhos distintos.
+
+    Os caminhos são agrupados por um hash polinomial das tarefas somado por caso
+    (np.add.reduceat), sem montar o texto de cada caso; cada caso é depois
+    conferido tarefa a tarefa contra o primeiro da sua variante e, se algum hash
+    colidir, os caminhos são agrupados pela sequência exata.
+    """
+    rows, c, t, _ = _case_events(df_hist, col_hist, col_time, keys)
+    task_codes, tasks = pd.factorize(df_hist[col_task].to_numpy()[rows], use_na_sentinel=False)
+    tasks = pd.Index(tasks).astype(str)
+    n_tasks = len(tasks)
+    if not len(c):
+        empty = pd.DataFrame(columns=["De", "Para", "Transições", "Casos", "Mediana (h)"])
+        return {"transicoes": empty, "variantes": pd.DataFrame(columns=["Variante", "Casos", "% Casos", "Eventos"]),
+                "n_variantes": 0}
+    starts = np.flatnonzero(np.append(True, c[1:] != c[:-1]))
+    stops = np.append(starts[1:], len(c))
+    n_cases = len(starts)
+
+    # transições internas + início/fim (códigos n_tasks e n_tasks + 1)
+    same = c[1:] == c[:-1]
+    src = np.concatenate([task_codes[:-1][same], np.full(n_cases, n_tasks), task_codes[stops - 1]])
+    dst = np.concatenate([task_codes[1:][same], task_codes[starts], np.full(n_cases, n_tasks + 1)])
+    case_of = np.concatenate([c[1:][same], c[starts], c[starts]])
+    # Início/Fim não são eventos: sem tempo de transição (NaN, fora da mediana)
+    hours = np.concatenate([((t[1:] - t[:-1])[same] / np.timedelta64(1, "h")), np.full(2 * n_cases, np.nan)])
+    pair = src.astype(np.int64) * (n_tasks + 2) + dst
+    trans = pd.DataFrame({"_p": pair, "_c": case_of, "_h": hours}).groupby("_p", sort=True)
+    node_names = tasks.append(pd.Index([PROCESS_START, PROCESS_END]))
+    pairs = trans.size().index.to_numpy()
+    transicoes = pd.DataFrame({
+        "De": node_names.take(pairs // (n_tasks + 2)),
+        "Para": node_names.take(pairs % (n_tasks + 2)),
+        "Transições": trans.size().to_numpy(),
+        "Casos": trans["_c"].nunique().to_numpy(),
+        "Mediana (h)": trans["_h"].median().round(2).to_numpy(),
+    }).sort_values("Transições", ascending=False, kind="stable").reset_index(drop=True)
+
+    # variantes: hash do caminho + comprimento; ids na ordem do primeiro caso
+    lengths = stops - starts
+    case_of_event = np.repeat(np.arange(n_cases), lengths)
+    pos = np.arange(len(c)) - starts[case_of_event]
+    variant, _ = pd.factorize(pd.MultiIndex.from_arrays([_path_hash(task_codes, pos, starts), lengths]))
+    rep = np.unique(variant, return_index=True)[1]   # primeiro caso de cada variante
+    ref_event = starts[rep[variant]][case_of_event] + pos
+    if (task_codes != task_codes[ref_event]).any():
+        # colisão de hash: agrupa pela sequência exata de tarefas
+        variant, _ = pd.factorize(pd.Series([task_codes[a:b].tobytes() for a, b in zip(starts, stops)]))
+        rep = np.unique(variant, return_index=True)[1]
+    counts = np.bincount(variant)
+    top = np.argsort(-counts, kind="stable")[:top_variants]
+    variantes = pd.DataFrame({
+        "Variante": [" → ".join(tasks.take(task_codes[starts[r]:stops[r]])) for r in rep[top]],
+        "Casos": counts[top],
+        "% Casos": (counts[top] / n_cases * 100).round(2),
+        "Eventos": lengths[rep[top]],
+    })
+    return {"transicoes": transicoes, "variantes": variantes, "n_variantes": int(len(counts))}
+
+
+# ── SLA por caso (CheckSLADeadline / ExecuteSLA / CheckSLAGoal) ─────────────
+SLA_DEADLINE, SLA_EXECUTE, SLA_GOAL = "CheckSLADeadline", "ExecuteSLA", "CheckSLAGoal"
+
+
+def _first_per_case(case_codes: np.ndarray, c: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Posição (nos eventos ordenados) do primeiro evento de `mask` de cada caso, ou -1."""
+    idx = np.flatnonzero(mask)
+    first = idx[np.append(True, c[idx][1:] != c[idx][:-1])] if len(idx) else idx
+    out = np.full(len(case_codes), -1, dtype=np.int64)
+    out[np.searchsorted(case_codes, c[first])] = first
+    return out
+
+
+def case_sla(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+             col_time: str = "Criar hora", col_task: str = "Nome da Tarefa",
+             col_exec: str = "Executante", col_tipo: str = "Tipo de Caso/Suporte",
+             keys: dict = None) -> pd.DataFrame:
+    """SLA de todos os casos do histórico, numa passada vetorizada.
+
+    A abertura do caso é o seu primeiro evento. Por chave: horas até o primeiro
+    ExecuteSLA, se houve CheckSLAGoal antes do primeiro CheckSLADeadline
+    ("Meta antes do prazo") e se o prazo estourou (CheckSLADeadline sem
+    CheckSLAGoal antes), com o executante do primeiro CheckSLADeadline e o tipo
+    do caso. Índice = código da chave, como em case_lifecycle.
+    """
+    rows, c, t, uniques = _case_events(df_hist, col_hist, col_time, keys)
+    starts = np.flatnonzero(np.append(True, c[1:] != c[:-1])) if len(c) else np.array([], dtype=np.int64)
+    case_codes = c[starts]
+    tasks = df_hist[col_task] if col_task in df_hist.columns else pd.Series(np.nan, index=df_hist.index)
+    first = {name: _first_per_case(case_codes, c, (tasks == name).to_numpy()[rows])
+             for name in (SLA_EXECUTE, SLA_GOAL, SLA_DEADLINE)}
+
+    def at(pos, values):
+        out = values[np.maximum(pos, 0)]
+        return np.where(pos >= 0, out, np.datetime64("NaT")) if values.dtype.kind == "M" else \
+            pd.Series(out).where(pos >= 0).to_numpy()
+
+    opened = t[starts]
+    t_exec, t_goal, t_dead = (at(first[n], t) for n in (SLA_EXECUTE, SLA_GOAL, SLA_DEADLINE))
+    has_goal, has_dead = ~np.isnat(t_goal), ~np.isnat(t_dead)
+    out = pd.DataFrame({
+        "Operação": uniques.take(case_codes),
+        "Abertura": opened,
+        "Primeiro ExecuteSLA": t_exec,
+        "Horas até ExecuteSLA": (t_exec - opened) / np.timedelta64(1, "h"),
+        "Primeiro CheckSLAGoal": t_goal,
+        "Primeiro CheckSLADeadline": t_dead,
+        "Meta antes do prazo": has_goal & (~has_dead | (t_goal < t_dead)),
+        "Prazo estourado": has_dead & (~has_goal | (t_dead <= t_goal)),
+    }, index=case_codes)
+    if col_tipo in df_hist.columns:
+        out.insert(1, col_tipo, df_hist[col_tipo].to_numpy()[rows][starts])
+    if col_exec in df_hist.columns:
+        out["Executante no prazo"] = at(first[SLA_DEADLINE], df_hist[col_exec].to_numpy()[rows])
+    return out
+
+
+def sla_breaches(sla: pd.DataFrame, by: str) -> pd.DataFrame:
+    """Casos, estouros de prazo e mediana de horas até ExecuteSLA por `by`."""
+    g = sla.groupby(by, observed=True, sort=False)
+    out = pd.DataFrame({
+        "Casos": g.size(),
+        "Estouros": g["Prazo estourado"].sum().astype(int),
+        "Meta antes do prazo": g["Meta antes do prazo"].sum().astype(int),
+        "Mediana h até ExecuteSLA": g["Horas até ExecuteSLA"].median().round(1),
+    })
+    out["% Estouro"] = (out["Estouros"] / out["Casos"] * 100).round(2)
+    return out.sort_values(["Estouros", "Casos"], ascending=False).reset_index()
+
+
+def sort_history(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+                 col_time: str = "Criar hora", keys: dict = None) -> tuple:
+    """Histórico reordenado por chave (e por `col_time` dentro de cada chave) e
+    um dicionário {chave: slice} com o intervalo contíguo de linhas de cada caso
+    → (hist_sorted, keys, index).
+
+    Com `keys` (ver encode_keys), devolve uma cópia de `keys` com os códigos do
+    histórico na nova ordem, para que o histórico ordenado substitua o original
+    (uma só cópia em memória). Sem `keys`, as chaves são usadas como estão na
+    coluna, sem normalização, e o segundo item é None.
+    """
+    if keys is not None:
+        codes, uniques = keys["hist"], keys["chaves"]
+    else:
+        codes, uniques = pd.factorize(df_hist[col_hist], sort=False)
+    sort_cols = {"_k": np.where(codes < 0, len(uniques), codes)}
+    if col_time in df_hist.columns:
+        sort_cols["_t"] = df_hist[col_time].to_numpy()
+    order = (
+        pd.DataFrame(sort_cols)
+        .sort_values(list(sort_cols), kind="stable", na_position="last")
+        .index.to_numpy()
+    )
+    hist_sorted = df_hist.take(order).reset_index(drop=True)
+
+    codes_sorted = codes[order]
+    # chaves nulas ficam no fim e não entram no índice
+    n_valid = int((codes_sorted >= 0).sum())
+    starts = np.flatnonzero(np.diff(codes_sorted[:n_valid], prepend=-1))
+    stops = np.append(starts[1:], n_valid)
+    index = {k: slice(int(a), int(b)) for k, a, b in zip(uniques.take(codes_sorted[starts]), starts, stops)}
+    keys_sorted = None if keys is None else {**keys, "hist": codes_sorted}
+    return hist_sorted, keys_sorted, index
+
+
+def build_history_index(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+                        col_time: str = "Criar hora", keys: dict = None) -> tuple:
+    """(hist_sorted, {chave: slice}) de sort_history.
+
+    O detalhamento de uma operação vira `hist.iloc[index[chave]]`, sem varrer o
+    histórico.
+    """
+    hist_sorted, _, index = sort_history(df_hist, col_hist, col_time, keys)
+    return hist_sorted, index
+
+
+def history_slice(hist_sorted: pd.DataFrame, index: dict, key) -> pd.DataFrame:
+    """Registros de uma chave, já ordenados (ver build_history_index)."""
+    sl = index.get(key)
+    return hist_sorted.iloc[sl] if sl is not None else hist_sorted.iloc[:0]
+
+
+def sort_index(values: pd.Series) -> tuple:
+    """Ordem crescente estável das posições de `values`, com nulos no fim → (posições, nº de não nulos)."""
+    order = values.reset_index(drop=True).sort_values(kind="stable", na_position="last").index.to_numpy()
+    return order, int(values.notna().sum())
+
+
+def _directed(order: np.ndarray, n_valid: int, ascending: bool) -> np.ndarray:
+    # decrescente: inverte só a parte não nula (nulos continuam no fim, como no pandas)
+    return order if ascending else np.concatenate([order[:n_valid][::-1], order[n_valid:]])
+
+
+def join_index(keys: dict) -> dict:
+    """Intervalo [início, fim) de cada código de chave no histórico ordenado, para
+    montar o cruzamento operação × histórico por partes. `keys` é o dicionário
+    devolvido por sort_history, com os códigos do histórico já na ordem dele."""
+    codes = keys["hist"]
+    n = len(keys["chaves"])
+    counts = np.bincount(codes[codes >= 0], minlength=n)
+    # linhas de um mesmo código são contíguas: a primeira ocorrência é o início
+    first_codes, first_pos = np.unique(codes, return_index=True)
+    valid = first_codes >= 0
+    starts = np.zeros(n, dtype=np.int64)
+    starts[first_codes[valid]] = first_pos[valid]
+    return {"op_codes": keys["cd"], "hist_codes": codes, "starts": starts, "counts": counts}
+
+
+def combined_rows(df_cd: pd.DataFrame, view_pos: np.ndarray, hist_sorted: pd.DataFrame,
+                  hist_cols: list, join: dict, start: int, stop: int,
+                  sort_by: tuple = None, ascending: bool = True) -> tuple:
+    """Linhas [start, stop) do cruzamento (left join) das operações `view_pos`
+    de df_cd com o histórico, sem montar o cruzamento inteiro.
+
+    `sort_by` é ("cd" | "hist", posições, nº de não nulos) vindo de sort_index
+    sobre df_cd ou hist_sorted. O total de linhas sai das contagens por chave.
+    Devolve (DataFrame das linhas pedidas, total de linhas do cruzamento).
+    """
+    op_codes, counts, starts = join["op_codes"], join["counts"], join["starts"]
+    in_view = np.zeros(len(df_cd), dtype=bool)
+    in_view[view_pos] = True
+
+    if sort_by is not None and sort_by[0] == "hist":
+        _, order, n_valid = sort_by
+        # operações da visão agrupadas por código: o r-ésimo par de uma linha do
+        # histórico vai para a r-ésima operação com a mesma chave
+        ops = np.flatnonzero(in_view)
+        ops = ops[np.argsort(op_codes[ops], kind="stable")]
+        ops_per_code = np.bincount(op_codes[ops], minlength=len(counts))
+        grp_start = np.concatenate([[0], np.cumsum(ops_per_code)[:-1]])
+
+        hist_seq = _directed(order, n_valid, ascending)
+        mult = ops_per_code[join["hist_codes"][hist_seq]]
+        cum = np.cumsum(mult)
+        n_matched = int(cum[-1]) if len(cum) else 0
+        unmatched = np.flatnonzero(in_view & (counts[op_codes] == 0))
+        total = n_matched + len(unmatched)
+
+        stop = min(stop, total)
+        m_pos = np.arange(start, min(stop, n_matched))
+        h_i = np.searchsorted(cum, m_pos, side="right")
+        rep = m_pos - (cum[h_i] - mult[h_i])
+        hist_pos = hist_seq[h_i]
+        op_pos = ops[grp_start[join["hist_codes"][hist_pos]] + rep]
+        u = unmatched[max(start - n_matched, 0):max(stop - n_matched, 0)]
+        op_pos = np.concatenate([op_pos, u])
+        hist_pos = np.concatenate([hist_pos, np.full(len(u), -1)])
+    else:
+        if sort_by is not None:
+            _, order, n_valid = sort_by
+            seq = _directed(order, n_valid, ascending)
+            seq = seq[in_view[seq]]
+        else:
+            seq = np.flatnonzero(in_view)
+        rows = np.maximum(counts[op_codes[seq]], 1)
+        cum = np.cumsum(rows)
+        total = int(cum[-1]) if len(cum) else 0
+
+        stop = min(stop, total)
+        if start >= stop:
+            op_pos = hist_pos = np.array([], dtype=np.int64)
+        else:
+            first = int(np.searchsorted(cum, start, side="right"))
+            last = int(np.searchsorted(cum, stop - 1, side="right"))
+            page_ops = seq[first:last + 1]
+            n_h = counts[op_codes[page_ops]]
+            width = np.maximum(n_h, 1)
+            op_pos = np.repeat(page_ops, width)
+            # posição de cada linha dentro do bloco da sua operação
+            offs = np.arange(len(op_pos)) - np.repeat(np.cumsum(width) - width, width)
+            hist_pos = np.where(np.repeat(n_h, width) > 0, starts[op_codes[op_pos]] + offs, -1)
+            skip = start - (int(cum[first]) - int(rows[first]))
+            op_pos = op_pos[skip:skip + (stop - start)]
+            hist_pos = hist_pos[skip:skip + (stop - start)]
+
+    left = df_cd.take(op_pos).reset_index(drop=True)
+    right = hist_sorted[hist_cols].reindex(hist_pos).reset_index(drop=True)
+    right.columns = [c if c not in left.columns else f"{c}_hist" for c in right.columns]
+    return pd.concat([left, right], axis=1), total
+
+
+# ── Cubo de contagens por período (linhas do tempo) ─────────────────────────
+# Resoluções do cubo, da mais fina para a mais grossa: rótulo → passo
+ROLLUP_LEVELS = {"Minuto": "m", "Hora": "h", "Dia": "D", "Mês": "M"}
+# Pontos por série que a escolha automática de resolução tenta não ultrapassar
+ROLLUP_MAX_POINTS = 400
+_ROLLUP_STEP = {"Minuto": np.timedelta64(1, "m"), "Hora": np.timedelta64(1, "h"),
+                "Dia": np.timedelta64(1, "D"), "Mês": np.timedelta64(30, "D")}
+
+
+def _count_pairs(periods: np.ndarray, groups: np.ndarray, weights: np.ndarray = None) -> tuple:
+    """Soma (ou conta) por (período, grupo) → (períodos, grupos, contagens) ordenados."""
+    order = np.lexsort((groups, periods))
+    p, g = periods[order], groups[order]
+    w = np.ones(len(p), dtype=np.int64) if weights is None else weights[order]
+    starts = np.flatnonzero(np.append(True, (p[1:] != p[:-1]) | (g[1:] != g[:-1]))) if len(p) else np.array([], dtype=np.int64)
+    return p[starts], g[starts], np.add.reduceat(w, starts) if len(p) else w
+
+
+def build_rollup(times: pd.Series, groups: pd.Series = None) -> dict:
+    """Contagens de eventos por período × grupo (tarefa, status…) em todas as
+    resoluções de ROLLUP_LEVELS.
+
+    Os dados brutos são lidos uma vez, para o nível de minuto; os demais níveis
+    são agregados a partir do anterior. Datas nulas ficam de fora.
+    """
+    t = pd.to_datetime(times, errors="coerce").to_numpy()
+    if groups is None:
+        codes, labels = np.zeros(len(t), dtype=np.int64), pd.Index(["Total"])
+    else:
+        codes, labels = pd.factorize(groups, sort=True)
+        codes = codes.astype(np.int64)
+    ok = ~np.isnat(t) & (codes >= 0)
+    cube = {"labels": labels, "levels": {}}
+    periods, codes_, counts = t[ok].astype("datetime64[m]"), codes[ok], None
+    for level, unit in ROLLUP_LEVELS.items():
+        periods, codes_, counts = _count_pairs(periods.astype(f"datetime64[{unit}]"), codes_, counts)
+        cube["levels"][level] = (periods.astype("datetime64[ns]"), codes_, counts)
+    return cube
+
+
+def rollup_extent(cube: dict) -> tuple:
+    """(primeiro, último) minuto com eventos, ou (None, None) se o cubo está vazio."""
+    periods = cube["levels"]["Minuto"][0]
+    if not len(periods):
+        return None, None
+    return pd.Timestamp(periods[0]), pd.Timestamp(periods[-1])
+
+
+def rollup_level(start, end, max_points: int = ROLLUP_MAX_POINTS) -> str:
+    """Resolução mais fina cujo número de períodos em [start, end] cabe em `max_points`."""
+    span = np.timedelta64(pd.Timestamp(end) - pd.Timestamp(start))
+    for level, step in _ROLLUP_STEP.items():
+        if span / step <= max_points:
+            return level
+    return "Mês"
+
+
+def rollup_series(cube: dict, start=None, end=None, level: str = None,
+                  col_period: str = "Período", col_group: str = "Grupo",
+                  col_count: str = "Eventos") -> tuple:
+    """Série (período, grupo, contagem) de [start, end] lida do cubo → (DataFrame, resolução).
+
+    Sem `level`, a resolução é escolhida por rollup_level a partir do intervalo.
+    """
+    first, last = rollup_extent(cube)
+    start = first if start is None else pd.Timestamp(start)
+    end = last if end is None else pd.Timestamp(end)
+    if first is None:
+        return pd.DataFrame(columns=[col_period, col_group, col_count]), level or "Mês"
+    level = level or rollup_level(start, end)
+    periods, codes, counts = cube["levels"][level]
+    # o período que contém `start` também entra (ex.: o mês de uma data no meio do mês)
+    lo = np.searchsorted(periods, np.datetime64(start, "ns").astype(f"datetime64[{ROLLUP_LEVELS[level]}]").astype("datetime64[ns]"))
+    hi = np.searchsorted(periods, np.datetime64(end, "ns"), side="right")
+    return pd.DataFrame({
+        col_period: periods[lo:hi],
+        col_group: cube["labels"].take(codes[lo:hi]),
+        col_count: counts[lo:hi],
+    }), level
+
+
+# ── Carga de trabalho por executante (sweep-line) ───────────────────────────
+def executor_workload(df_hist: pd.DataFrame, col_hist: str = COL_CHAVE_HIST,
+                      col_time: str = "Criar hora", col_exec: str = "Executante") -> dict:
+    """Casos abertos por executante ao longo do tempo, por varredura dos eventos.
+
+    Um caso está aberto para um executante do primeiro ao último evento dele no
+    caso, inclusive nos dois instantes (intervalo fechado): um caso com um só
+    evento, ou uma passagem de caso no mesmo instante, conta naquele instante.
+    Cada intervalo vira +1 no início e -1 no fim; ordenados por (executante,
+    data, inícios antes de fins), a soma acumulada dá os casos abertos, em
+    O(n log n). Devolve:
+
+    - "abertos": (Executante, Momento, Casos abertos) a cada instante com
+      eventos, o valor no instante e, se diferente, o valor depois dele;
+    - "encerrados": fins de intervalo, (Executante, Momento), para a vazão;
+    - "resumo": por executante, casos, pico de casos abertos (o maior valor
+      de "abertos") e quando ocorreu.
+    """
+    abertos_cols = ["Executante", "Momento", "Casos abertos"]
+    resumo_cols = ["Executante", "Casos atendidos", "Pico de casos abertos", "Momento do pico"]
+    events = pd.DataFrame({
+        "_k": pd.factorize(df_hist[col_hist])[0],
+        "_e": pd.Categorical(df_hist[col_exec]).codes,
+        "_t": pd.to_datetime(df_hist[col_time], errors="coerce").to_numpy(),
+    })
+    labels = pd.Categorical(df_hist[col_exec]).categories
+    events = events[(events["_k"] >= 0) & (events["_e"] >= 0) & events["_t"].notna()]
+    if events.empty:
+        return {"abertos": pd.DataFrame(columns=abertos_cols),
+                "encerrados": pd.DataFrame(columns=["Executante", "Momento"]),
+                "resumo": pd.DataFrame(columns=resumo_cols)}
+    spans = events.groupby(["_e", "_k"], sort=False)["_t"].agg(["min", "max"])
+
+    ex = spans.index.get_level_values("_e").to_numpy()
+    n = len(spans)
+    e = np.concatenate([ex, ex])
+    t = np.concatenate([spans["min"].to_numpy(), spans["max"].to_numpy()])
+    delta = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64)])
+    order = np.lexsort((-delta, t, e))
+    e, t, delta = e[order], t[order], delta[order]
+    # cada executante soma zero no fim: a soma acumulada global vale por executante
+    level = np.cumsum(delta)
+
+    # por instante (executante, data): inícios vêm antes dos fins, então o valor
+    # no instante é o de antes + inícios do instante; o de depois é o da última linha
+    first = np.flatnonzero(np.append(True, (e[1:] != e[:-1]) | (t[1:] != t[:-1])))
+    last = np.append(first[1:], len(e)) - 1
+    at_instant = level[first] - delta[first] + np.add.reduceat((delta > 0).astype(np.int64), first)
+    after = level[last]
+    changed = after != at_instant
+    abertos = pd.DataFrame({
+        "_e": np.concatenate([e[first], e[last][changed]]),
+        "_t": np.concatenate([t[first], t[last][changed]]),
+        "_o": np.concatenate([np.arange(len(first)) * 2, np.flatnonzero(changed) * 2 + 1]),
+        "_lvl": np.concatenate([at_instant, after[changed]]),
+    }).sort_values("_o", kind="stable")
+    ends = delta < 0
+    encerrados = pd.DataFrame({"Executante": labels.take(e[ends]), "Momento": t[ends]})
+
+    at_peak = abertos.loc[abertos.groupby("_e", sort=True)["_lvl"].idxmax()]
+    resumo = pd.DataFrame({
+        "Executante": labels.take(at_peak["_e"].to_numpy()),
+        "Casos atendidos": np.bincount(ex, minlength=len(labels))[at_peak["_e"].to_numpy()],
+        "Pico de casos abertos": at_peak["_lvl"].to_numpy(),
+        "Momento do pico": at_peak["_t"].to_numpy(),
+    }).sort_values("Pico de casos abertos", ascending=False, kind="stable").reset_index(drop=True)
+    abertos = pd.DataFrame({
+        "Executante": labels.take(abertos["_e"].to_numpy()),
+        "Momento": abertos["_t"].to_numpy(),
+        "Casos abertos": abertos["_lvl"].to_numpy(),
+    })
+    return {"abertos": abertos, "encerrados": encerrados, "resumo": resumo}
+
+
+def workload_series(workload: dict, start, end, executors=None, level: str = None) -> tuple:
+    """Casos abertos (máximo por período) e vazão (casos encerrados por período)
+    de [start, end] → (abertos, vazao, resolução), com a resolução de rollup_level."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    level = level or rollup_level(start, end)
+    unit = ROLLUP_LEVELS[level]
+
+    def window(df):
+        m = (df["Momento"] >= start) & (df["Momento"] <= end)
+        if executors is not None:
+            m &= df["Executante"].isin(executors)
+        return df[m].assign(Período=lambda d: d["Momento"].to_numpy().astype(f"datetime64[{unit}]").astype("datetime64[ns]"))
+
+    ab = workload["abertos"]
+    # valor em vigor no início da janela, para a série não começar do zero
+    before = ab[ab["Momento"] < start]
+    if executors is not None:
+        before = before[before["Executante"].isin(executors)]
+    carry = before.groupby("Executante", observed=True).tail(1).assign(Momento=start)
+    abertos = (
+        window(pd.concat([carry, ab], ignore_index=True))
+        .groupby(["Período", "Executante"], observed=True)["Casos abertos"].max().reset_index()
+    )
+    vazao = (
+        window(workload["encerrados"])
+        .groupby(["Período", "Executante"], observed=True).size().reset_index(name="Casos encerrados")
+    )
+    return abertos, vazao, level
+
+
+def null_global_pct(df: pd.DataFrame) -> float:
+    cells = df.shape[0] * df.shape[1]
+    return float(df.isnull().sum().sum() / cells * 100) if cells else 0.0
+
+
+def kpi_summary(df_cd=None, df_hist=None, validation=None,
+                col_cd: str = COL_CHAVE_CD, col_hist: str = COL_CHAVE_HIST) -> dict:
+    """KPIs do dashboard em um dicionário serializável em JSON."""
+    kpis: dict = {}
+    if df_cd is not None:
+        kpis["total_operacoes"] = int(len(df_cd))
+        kpis["colunas_operacoes"] = int(df_cd.shape[1])
+        kpis["nulos_operacoes_pct"] = round(null_global_pct(df_cd), 2)
+        if col_cd in df_cd.columns:
+            kpis["chaves_duplicadas_operacoes"] = int(df_cd[col_cd].duplicated().sum())
+    if df_hist is not None:
+        hist_por_op = df_hist[col_hist].value_counts() if col_hist in df_hist.columns else pd.Series(dtype=int)
+        kpis["total_historico"] = int(len(df_hist))
+        kpis["operacoes_referenciadas"] = int(hist_por_op.size)
+        kpis["media_registros_por_operacao"] = round(float(hist_por_op.mean()), 2) if hist_por_op.size else 0.0
+        kpis["nulos_historico_pct"] = round(null_global_pct(df_hist), 2)
+    if validation is not None:
+        n_ops  = len(df_cd) if df_cd is not None else 0
+        n_hist = len(df_hist) if df_hist is not None else 0
+        n_ops_sem  = len(validation["ops_sem_hist"])
+        n_hist_sem = len(validation["hist_sem_op"])
+        kpis["operacoes_sem_historico"] = int(n_ops_sem)
+        kpis["operacoes_sem_historico_pct"] = round(n_ops_sem / n_ops * 100, 2) if n_ops else 0.0
+        kpis["chaves_historico_sem_operacao"] = validation["n_chaves_hist_sem"]
+        kpis["linhas_historico_sem_operacao"] = int(n_hist_sem)
+        kpis["linhas_historico_sem_operacao_pct"] = round(n_hist_sem / n_hist * 100, 2) if n_hist else 0.0
+    return kpis
@@ -1,13 +1,34 @@
-import streamlit as st
+import warnings
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import numpy as np
-import io
-import warnings
+import streamlit as st
+
+import exports
+import parse_cache
+import store
+from analytics import (
+    COL_CHAVE_CD, COL_CHAVE_HIST, LIFECYCLE_TASK_PREFIX, ROLLUP_LEVELS, build_history_index, build_rollup,
+    case_lifecycle, case_sla, column_quality, combined_rows, encode_keys, executor_workload,
+    history_per_operation, history_slice, join_index, link_validation, merge_history_counts, process_map,
+    rollup_extent, rollup_series, sla_breaches, sort_history, sort_index, workload_series,
+)
+from loaders import (
+    SUPPORTED_EXTENSIONS, optimize_dtypes, read_keyed_sheets, read_sheet, sheet_catalogue,
+)
+from profiler import profile_columns
+from search import PICKER_LIMIT, build_key_index, build_search_index, prefix_search, search, suggest_matches
 
 warnings.filterwarnings("ignore")
 
+# Copy-on-Write (padrão a partir do pandas 3): os DataFrames compartilhados entre
+# sessões via st.cache_resource são só lidos; filtros e colunas derivadas geram
+# objetos novos sem cópias defensivas.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # ─────────────────────────────────────────────────────────────────────────────
 # PAGE CONFIG
 # ─────────────────────────────────────────────────────────────────────────────
@@ -162,6 +183,18 @@ TASK_COLOR_MAP = {
     "CheckSLAGoal":    "#3fb950",
 }
 
+# Chaves de vínculo entre ControleDiario e pxGetWorkHistory (nunca viram category)
+KEY_COLUMNS = (COL_CHAVE_CD, COL_CHAVE_HIST)
+
+# Colunas cobertas pela busca do modo combinado
+SEARCH_COLUMNS = ["ID do Caso", "Razão Social", "Nome Fantasia", COL_CHAVE_CD, "Operador"]
+
+# Eventos por página na linha do tempo do detalhamento
+TIMELINE_PAGE_SIZE = 50
+
+# Tamanhos de página da Tabela Combinada (só a página pedida é montada)
+TABLE_PAGE_SIZES = [100, 250, 500, 1000]
+
 DB_MODES = {
     "📋  Registros de Operações": "ops",
     "🕐  Histórico de Operações": "history",
@@ -171,11 +204,238 @@ DB_MODES = {
 # ─────────────────────────────────────────────────────────────────────────────
 # HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
+def _progress_reporter(label: str):
+    """Barra de progresso por linhas lidas, criada só se houver leitura de fato.
+
+    Devolve (callback, finalizar)."""
+    state = {}
+
+    def _report(sheet: str, done: int, total):
+        if "bar" not in state:
+            state["bar"] = st.progress(0.0, text=label)
+        if total:
+            state["bar"].progress(min(done / total, 1.0), text=f"{label} · {sheet}: {done:,} / {total:,} linhas")
+        else:
+            state["bar"].progress(0.0, text=f"{label} · {sheet}: {done:,} linhas")
+
+    def _done():
+        if "bar" in state:
+            state["bar"].empty()
+
+    return _report, _done
+
+
+def upload_fingerprint(uploaded) -> str:
+    """Hash do conteúdo do upload, calculado uma única vez por arquivo enviado.
+
+    Fica guardado na sessão pelo file_id do upload; os loaders em cache são
+    chaveados por ele (e recebem o arquivo em argumentos `_` não-hasheados),
+    então um rerun por causa de um filtro não re-hasheia os bytes.
+    """
+    fps = st.session_state.setdefault("_upload_fingerprints", {})
+    file_id = getattr(uploaded, "file_id", None) or f"{uploaded.name}:{uploaded.size}"
+    if file_id not in fps:
+        fps[file_id] = parse_cache.content_hash(uploaded.getvalue())
+    return fps[file_id]
+
+
+def read_sheet_cached(fingerprint: str, file_bytes: bytes, sheet: str, report=None) -> pd.DataFrame:
+    """Uma planilha do arquivo, passando pelo cache em disco."""
+    df = parse_cache.load_sheet(fingerprint, sheet)
+    if df is None:
+        df = read_sheet(file_bytes, sheet, progress=report)
+        parse_cache.save_sheets(fingerprint, {sheet: df}, complete=False)
+    return df
+
+
 @st.cache_data(show_spinner=False)
-def load_excel(file_bytes: bytes, filename: str) -> dict:
-    buf = io.BytesIO(file_bytes)
-    xl = pd.ExcelFile(buf)
-    return {sheet: xl.parse(sheet) for sheet in xl.sheet_names}
+def load_sheet_catalogue(fingerprint: str, _upload) -> list:
+    return sheet_catalogue(_upload.getvalue())
+
+
+# Os datasets carregados ficam em st.cache_resource: um único objeto por processo,
+# compartilhado por todas as sessões que abrem o mesmo arquivo (st.cache_data
+# devolveria uma cópia desserializada para cada chamada). Os load_* abaixo são
+# chaveados pelo fingerprint do arquivo (ou do par de arquivos): cada índice,
+# tabela ou relatório é montado uma vez por arquivo e depois só lido.
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_excel(fingerprint: str, filename: str, sheet: str, _upload) -> tuple:
+    report, done = _progress_reporter(f"📄 {filename}")
+    df = read_sheet_cached(fingerprint, _upload.getvalue(), sheet, report)
+    done()
+    return optimize_dtypes(df, exclude=KEY_COLUMNS)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_history_index(fingerprint: str, sheet: str, col_key: str, col_time: str, _df: pd.DataFrame) -> tuple:
+    """Histórico ordenado por chave/hora + {chave: slice} (analytics.build_history_index)."""
+    return build_history_index(_df, col_key, col_time)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_lifecycle(fingerprint, col_key: str, col_time: str, col_task: str, col_exec: str,
+                   _df: pd.DataFrame, _keys: dict = None) -> pd.DataFrame:
+    """Ciclo de vida de todos os casos (analytics.case_lifecycle)."""
+    return case_lifecycle(_df, col_key, col_time, col_task, col_exec, keys=_keys)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_profile(fingerprint, _df: pd.DataFrame) -> pd.DataFrame:
+    """Perfil das colunas (profiler.profile_columns)."""
+    return profile_columns(_df)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_sla(fingerprint, col_key: str, col_time: str, col_task: str, col_exec: str, col_tipo: str,
+             _df: pd.DataFrame) -> dict:
+    """SLA por caso (analytics.case_sla) e estouros por executante/tipo."""
+    sla = case_sla(_df, col_key, col_time, col_task, col_exec, col_tipo)
+    return {"casos": sla, "por_executante": sla_breaches(sla, "Executante no prazo"),
+            "por_tipo": sla_breaches(sla, col_tipo)}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_workload(fingerprint, col_key: str, col_time: str, col_exec: str, _df: pd.DataFrame) -> dict:
+    """Casos abertos por executante (analytics.executor_workload)."""
+    return executor_workload(_df, col_key, col_time, col_exec)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_process_map(fingerprint, col_key: str, col_time: str, col_task: str, _df: pd.DataFrame) -> dict:
+    """Transições entre tarefas e variantes (analytics.process_map)."""
+    return process_map(_df, col_key, col_time, col_task)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_history_counts(fingerprint, col_key: str, _df: pd.DataFrame) -> tuple:
+    """Registros por operação: (Series chave → contagem, tabela de history_per_operation)."""
+    return _df[col_key].value_counts(), history_per_operation(_df, col_key)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_key_index(fingerprint, col_key: str, _df: pd.DataFrame, _hist_por_op: pd.Series,
+                   _ciclo: pd.DataFrame) -> dict:
+    """Índice de prefixo das chaves (search.build_key_index) + critérios de ordenação
+    alinhados às chaves."""
+    index = build_key_index(_df[col_key])
+    index["ordem"] = {
+        "Mais eventos": _hist_por_op.reindex(index["keys"]).to_numpy(dtype=np.float64),
+        "Maior duração": _ciclo.set_index("Operação")["Duração total (h)"].reindex(index["keys"]).to_numpy(),
+        "Ordem alfabética": None,
+    }
+    return index
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_rollup(fingerprint, col_time: str, col_group, _df: pd.DataFrame) -> dict:
+    """Cubo de contagens por minuto/hora/dia/mês × grupo (analytics.build_rollup)."""
+    return build_rollup(_df[col_time], _df[col_group] if col_group else None)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_link_report(cd_fp: str, hist_fp: str, col_cd: str, col_hist: str,
+                     _df_cd: pd.DataFrame, _df_hist: pd.DataFrame, _keys: dict) -> dict:
+    """Relatório de vínculo (analytics.link_validation) do par de arquivos."""
+    return link_validation(_df_cd, _df_hist, col_cd, col_hist, _keys)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_join_index(cd_fp: str, hist_fp: str, _keys: dict) -> dict:
+    """Intervalos do histórico por código de chave, para a Tabela Combinada paginada."""
+    return join_index(_keys)
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_sort_index(cd_fp: str, hist_fp: str, side: str, col: str, _df: pd.DataFrame) -> tuple:
+    """Ordem pré-calculada de uma coluna (operações ou histórico) para a Tabela Combinada."""
+    return sort_index(_df[col])
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_search_index(cd_fp: str, hist_fp: str, _df_cd: pd.DataFrame) -> dict:
+    """Índice de busca das operações (search.py) para a caixa "Buscar ID / Razão Social"."""
+    return build_search_index(_df_cd, SEARCH_COLUMNS)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_match_suggestions(cd_fp: str, hist_fp: str, _vinculo: dict, _df_cd: pd.DataFrame, col_cd: str) -> pd.DataFrame:
+    """Candidatas (search.suggest_matches) para as chaves do histórico sem operação."""
+    labels = _df_cd["ID do Caso"] if "ID do Caso" in _df_cd.columns else None
+    return suggest_matches(_vinculo["chaves_hist_sem"], _df_cd[col_cd], labels)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_export_file(key: str, finished: float, _path) -> bytes:
+    """Conteúdo de uma exportação pronta, lido do disco uma vez por job (chave + término)."""
+    return _path.read_bytes()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_store(version: int) -> tuple:
+    """Base consolidada de exports diários (store.py); `version` invalida o cache a cada ingestão."""
+    return optimize_dtypes(store.open_consolidated(), exclude=KEY_COLUMNS)
+
+
+@st.cache_data(show_spinner=False)
+def load_store_changes(version: int) -> pd.DataFrame:
+    return store.change_log()
+
+
+def render_memory_report(mem_report: pd.DataFrame):
+    """Expander na sidebar com o uso de memória antes/depois da otimização de tipos."""
+    before = mem_report["Memória antes (KB)"].sum() / 1024
+    after  = mem_report["Memória depois (KB)"].sum() / 1024
+    with st.sidebar.expander(f"🧠 Memória: {before:,.1f} MB → {after:,.1f} MB"):
+        st.caption(f"Redução de {(1 - after / before) * 100 if before else 0:.0f}% após a otimização de tipos.")
+        st.dataframe(mem_report, use_container_width=True, hide_index=True)
+
+
+@st.fragment(run_every=1.0)
+def _export_progress(key: str, fmt: str):
+    job = exports.status(key, fmt)
+    if job is None or job["status"] != "running":
+        st.rerun()
+    st.progress(exports.progress(job), text=f"⏳ Gerando arquivo… {job['rows_done']:,} linhas")
+
+
+def render_export(label: str, widget_key: str, fingerprint, filter_state, fmt: str,
+                  source, total_rows: int, file_name: str):
+    """Exportação sob demanda: o clique inicia um job em segundo plano (exports.py);
+    quando o arquivo fica pronto, aparece o botão de download."""
+    key = exports.export_key(fingerprint, filter_state, fmt)
+    job = exports.status(key, fmt)
+    if job is None or job["status"] == "error":
+        if job is not None:
+            st.error(f"❌ Falha na exportação: {job['error']}")
+        if not st.button(label, key=widget_key):
+            return
+        job = exports.submit(key, fmt, source, total_rows)
+    if job["status"] == "running":
+        _export_progress(key, fmt)
+    elif job["status"] == "done":
+        st.download_button(
+            f"📥 Baixar {file_name}", data=load_export_file(key, job["finished"], job["path"]), file_name=file_name,
+            mime=exports.MIME[fmt], key=f"{widget_key}_down",
+        )
+
+
+def rollup_timeline(cube: dict, widget_key: str, col_group: str = "Grupo") -> tuple:
+    """Controles de período e resolução de uma linha do tempo → (série lida do cubo, resolução).
+
+    A resolução "Automática" segue o intervalo escolhido; nada aqui relê as linhas brutas.
+    """
+    first, last = rollup_extent(cube)
+    if first is None:
+        return rollup_series(cube, col_group=col_group)
+    c1, c2 = st.columns([3, 1])
+    d0, d1 = first.date(), last.date()
+    if d0 < d1:
+        d0, d1 = c1.slider("Período", min_value=d0, max_value=d1, value=(d0, d1),
+                           format="DD/MM/YYYY", key=f"{widget_key}_range")
+    nivel = c2.selectbox("Resolução", ["Automática", *ROLLUP_LEVELS], key=f"{widget_key}_level")
+    start = pd.Timestamp(d0)
+    end = pd.Timestamp(d1) + pd.Timedelta(days=1) - pd.Timedelta(minutes=1)
+    return rollup_series(cube, start, end, None if nivel == "Automática" else nivel, col_group=col_group)
 
 
 def null_badge(pct: float) -> str:
@@ -195,16 +455,15 @@ def metric_card(icon: str, value, label: str, color: str = "blue") -> str:
     </div>"""
 
 
-def render_quality_table(df: pd.DataFrame, total_rows: int):
-    """Render the per-column quality HTML list."""
-    null_series     = df.isnull().sum()
-    null_pct_series = (null_series / total_rows * 100).round(2)
+def render_quality_table(profile: pd.DataFrame, total_rows: int):
+    """Render the per-column quality HTML list from a column profile (profiler.py)."""
     html = ""
-    for col in df.columns:
-        n_null = int(null_series[col])
-        pct    = float(null_pct_series[col])
-        dtype  = str(df[col].dtype)
-        n_uniq = int(df[col].nunique(dropna=True))
+    for row in profile.itertuples(index=False):
+        col    = row.Coluna
+        n_null = int(row.Nulos)
+        pct    = float(row[profile.columns.get_loc("% Nulos")])
+        dtype  = row.Tipo
+        n_uniq = f"≈{row.Únicos:,}" if row[profile.columns.get_loc("Únicos aprox.")] else f"{row.Únicos}"
         bar    = f'<div class="null-bar" style="width:{min(pct,100):.1f}%;"></div>'
         html  += f"""
         <div class="stat-row">
@@ -257,7 +516,7 @@ with st.sidebar:
     if db_mode == "combined":
         st.markdown("**📋 Arquivo de Operações (ControleDiario):**")
         uploaded_cd = st.file_uploader(
-            "Operações", type=["xlsx", "xls"],
+            "Operações", type=list(SUPPORTED_EXTENSIONS),
             help="Arquivo ControleDiario com as operações de câmbio.",
             key="up_cd",
         )
@@ -267,7 +526,7 @@ with st.sidebar:
 
         st.markdown("**📜 Arquivo de Histórico (pxGetWorkHistory):**")
         uploaded_hist = st.file_uploader(
-            "Histórico", type=["xlsx", "xls"],
+            "Histórico", type=list(SUPPORTED_EXTENSIONS),
             help="Arquivo pxGetWorkHistory com o log de eventos.",
             key="up_hist",
         )
@@ -279,14 +538,55 @@ with st.sidebar:
     else:
         uploaded_cd   = None
         uploaded_hist = None
-        uploaded_file = st.file_uploader(
-            "📂 Carregar arquivo Excel",
-            type=["xlsx", "xls"],
-            help="Faça upload do relatório exportado do CRM.",
-        )
-        if uploaded_file:
-            st.success(f"✅ **{uploaded_file.name}**")
-            st.caption(f"Tamanho: {uploaded_file.size / 1024:.1f} KB")
+        ops_source    = "upload"
+        if db_mode == "ops":
+            ops_source = st.radio(
+                "Fonte dos dados", ["upload", "store"], horizontal=True,
+                format_func=lambda s: "📂 Arquivo" if s == "upload" else "🗃️ Base consolidada",
+                help=(
+                    "Base consolidada: exports diários do ControleDiario já ingeridos, "
+                    "com a versão mais recente de cada caso."
+                ),
+            )
+
+        if ops_source == "store":
+            uploaded_file = None
+            new_exports = st.file_uploader(
+                "➕ Ingerir exports diários",
+                type=list(SUPPORTED_EXTENSIONS),
+                accept_multiple_files=True,
+                help="Só os casos do arquivo novo são processados; exports já ingeridos são ignorados.",
+                key="up_store",
+            )
+            ingested_ids = st.session_state.setdefault("_store_ingested", set())
+            for up in new_exports or []:
+                if up.file_id in ingested_ids:
+                    continue
+                with st.spinner(f"Ingerindo {up.name}…"):
+                    try:
+                        rec = store.ingest(up.getvalue(), up.name)
+                    except store.StoreError as exc:
+                        st.error(f"❌ {exc}")
+                        continue
+                ingested_ids.add(up.file_id)
+                if rec.get("ja_ingerido"):
+                    st.info(f"= {up.name}: já estava na base")
+                else:
+                    st.success(
+                        f"✅ {up.name}: {rec['casos_novos']:,} casos novos · "
+                        f"{rec['status_alterados']:,} status alterados"
+                    )
+            store_manifest = store.read_manifest()
+            st.caption(f"🗃️ {len(store_manifest['exports'])} export(s) na base")
+        else:
+            uploaded_file = st.file_uploader(
+                "📂 Carregar arquivo (Excel ou CSV)",
+                type=list(SUPPORTED_EXTENSIONS),
+                help="Faça upload do relatório exportado do CRM (XLSX, XLSB, XLS ou CSV).",
+            )
+            if uploaded_file:
+                st.success(f"✅ **{uploaded_file.name}**")
+                st.caption(f"Tamanho: {uploaded_file.size / 1024:.1f} KB")
 
     st.markdown("<hr style='border-color:#30363d; margin:16px 0 8px;'>", unsafe_allow_html=True)
     st.markdown(
@@ -341,14 +641,14 @@ if db_mode == "combined":
             unsafe_allow_html=True,
         )
         st.stop()
-elif not uploaded_file:
+elif not uploaded_file and not (ops_source == "store" and store_manifest["version"]):
     st.markdown(
         """
         <div style="background:linear-gradient(135deg,#1c2333,#161b26);border:1px dashed #30363d;
                     border-radius:16px;padding:60px 40px;text-align:center;margin-top:40px;">
             <div style="font-size:3rem;margin-bottom:16px;">📊</div>
             <h2 style="color:#e6edf3;font-size:1.4rem;margin-bottom:8px;">
-                Faça upload do seu Excel para começar
+                Faça upload do seu Excel ou CSV para começar
             </h2>
             <p style="color:#6e7681;max-width:500px;margin:0 auto;">
                 Use o painel lateral para selecionar o tipo de base de dados e depois
@@ -365,57 +665,74 @@ elif not uploaded_file:
 # ─────────────────────────────────────────────────────────────────────────────
 if db_mode == "combined":
     # ── Carregar os dois arquivos separados
-    @st.cache_data(show_spinner=False)
-    def load_combined(cd_bytes, hist_bytes):
-        df_cd   = pd.read_excel(io.BytesIO(cd_bytes))
-        df_hist = pd.read_excel(io.BytesIO(hist_bytes))
+    @st.cache_resource(max_entries=4, show_spinner=False)
+    def load_combined(cd_fp, hist_fp, _up_cd, _up_hist):
         # Constantes de chave
-        col_chave_cd   = "Chave de manipulação de instâncias"
-        col_chave_hist = "Histórico de"
-        # Normalizar chaves
-        df_cd[col_chave_cd]     = df_cd[col_chave_cd].astype(str).str.strip()
-        df_hist[col_chave_hist] = df_hist[col_chave_hist].astype(str).str.strip()
+        col_chave_cd   = COL_CHAVE_CD
+        col_chave_hist = COL_CHAVE_HIST
+        # Leitura dos dois arquivos em paralelo, já com as chaves normalizadas
+        report, done = _progress_reporter("📄 Lendo arquivos")
+        df_cd, df_hist = read_keyed_sheets([
+            (_up_cd.getvalue(),   col_chave_cd,   cd_fp),
+            (_up_hist.getvalue(), col_chave_hist, hist_fp),
+        ], progress=report)
+        done()
+        # Chaves dos dois arquivos num dicionário comum de inteiros (cruzamentos em int32)
+        key_codes = encode_keys(df_cd, df_hist, col_chave_cd, col_chave_hist)
         # Contagem de histórico por operação
-        hist_count = (
-            df_hist.groupby(col_chave_hist)
-            .size()
-            .reset_index(name="Qtd Histórico")
-        )
-        df_cd = df_cd.merge(
-            hist_count,
-            left_on=col_chave_cd,
-            right_on=col_chave_hist,
-            how="left",
-            suffixes=("", "_h"),
-        )
-        df_cd["Qtd Histórico"] = df_cd["Qtd Histórico"].fillna(0).astype(int)
-        if col_chave_hist in df_cd.columns and col_chave_hist != col_chave_cd:
-            df_cd.drop(columns=[col_chave_hist], inplace=True)
-        return df_cd, df_hist, col_chave_cd, col_chave_hist
+        df_cd = merge_history_counts(df_cd, df_hist, col_chave_cd, col_chave_hist, key_codes)
+        # Tipos compactos (category / downcast) depois do cruzamento
+        df_cd, mem_cd     = optimize_dtypes(df_cd, exclude=KEY_COLUMNS)
+        df_hist, mem_hist = optimize_dtypes(df_hist, exclude=KEY_COLUMNS)
+        mem_report = pd.concat([
+            mem_cd.assign(Tabela="Operações"), mem_hist.assign(Tabela="Histórico"),
+        ], ignore_index=True)
+        # Histórico ordenado por chave/hora substitui o original (uma só cópia) e
+        # o índice chave → intervalo de linhas permite o detalhamento sem varredura
+        df_hist, key_codes, hist_slices = sort_history(df_hist, col_chave_hist, keys=key_codes)
+        hist_index = (df_hist, hist_slices)
+        return df_cd, df_hist, col_chave_cd, col_chave_hist, mem_report, hist_index, key_codes
 
     with st.spinner("Carregando e cruzando os dados…"):
-        df_cd, df_hist_raw, COL_CD, COL_HIST = load_combined(
-            uploaded_cd.getvalue(), uploaded_hist.getvalue()
+        cd_fp, hist_fp = upload_fingerprint(uploaded_cd), upload_fingerprint(uploaded_hist)
+        df_cd, df_hist_raw, COL_CD, COL_HIST, mem_report, hist_index, key_codes = load_combined(
+            cd_fp, hist_fp, uploaded_cd, uploaded_hist,
         )
 
-else:
-    with st.spinner("Carregando e processando dados..."):
-        sheets = load_excel(uploaded_file.getvalue(), uploaded_file.name)
+elif ops_source == "store":
+    with st.spinner("Abrindo a base consolidada..."):
+        df_raw, mem_report = load_store(store_manifest["version"])
+    data_fp = ("store", store_manifest["version"])
 
-    main_sheet = max(sheets.items(), key=lambda kv: len(kv[1]))[0]
-    df_raw = sheets[main_sheet].copy()
+    with st.expander(f"🕘 Log de alterações de status · {len(store_manifest['exports'])} export(s) ingerido(s)"):
+        st.dataframe(pd.DataFrame(store_manifest["exports"]).drop(columns=["hash"]),
+                     use_container_width=True, hide_index=True)
+        st.dataframe(load_store_changes(store_manifest["version"]),
+                     use_container_width=True, hide_index=True, height=300)
 
-    # Sidebar sheet selector (only for ops mode)
+else:
+    file_fp    = upload_fingerprint(uploaded_file)
+    catalogue  = load_sheet_catalogue(file_fp, uploaded_file)
+    sheet_info = {s["name"]: s for s in catalogue}
+    main_sheet = max(catalogue, key=lambda s: s["rows"])["name"]
+
+    # Sidebar sheet selector (only for ops mode) — só a planilha escolhida é lida
     if db_mode == "ops":
         with st.sidebar:
-            if len(sheets) > 1:
+            if len(catalogue) > 1:
                 st.markdown("**📋 Planilhas disponíveis**")
                 main_sheet = st.selectbox(
                     "Selecione a planilha principal:",
-                    list(sheets.keys()),
-                    index=list(sheets.keys()).index(main_sheet),
+                    list(sheet_info.keys()),
+                    index=list(sheet_info.keys()).index(main_sheet),
+                    format_func=lambda s: f"{s} · {sheet_info[s]['rows']:,} linhas × {sheet_info[s]['cols']} col.",
                 )
-                df_raw = sheets[main_sheet].copy()
+
+    with st.spinner("Carregando e processando dados..."):
+        df_raw, mem_report = load_excel(file_fp, uploaded_file.name, main_sheet, uploaded_file)
+    data_fp = (file_fp, main_sheet)
+
+render_memory_report(mem_report)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -437,6 +754,56 @@ if db_mode == "combined":
             return pd.Timestamp(val).strftime("%d/%m/%Y")
         except Exception: return str(val)
 
+    def _text_col(df, col, default):
+        # mesmo texto de str(valor) célula a célula; só "nan" vira o padrão
+        if col not in df.columns:
+            return pd.Series(default, index=df.index)
+        txt = df[col].map(str)
+        return txt.mask(txt == "nan", default)
+
+    def _date_col(df, col):
+        if col not in df.columns:
+            return pd.Series("—", index=df.index)
+        ser = df[col]
+        if pd.api.types.is_datetime64_any_dtype(ser):
+            return ser.dt.strftime("%d/%m/%Y").fillna("—")
+        return ser.map(_fmt_date)
+
+    def _timeline_html(df_h, offset: int, n_total: int) -> str:
+        """Cartões da linha do tempo (uma página) gerados coluna a coluna, num só bloco HTML."""
+        pos    = np.arange(offset, offset + len(df_h))
+        first  = pos == 0
+        last   = pos == n_total - 1
+        dot_c  = np.select([first, last], ["#56d364", "#f85149"], "#388bfd")
+        dot_g  = np.select([first, last], ["rgba(63,185,80,.5)", "rgba(248,81,73,.5)"], "rgba(56,139,253,.5)")
+        sep    = np.where(last, "", "<div style='width:2px;background:#30363d;height:16px;margin:2px auto 0 auto'></div>")
+        mb     = np.where(last, "0px", "8px")
+        tarefa = _text_col(df_h, "Nome da Tarefa", "—").to_numpy()
+        exec_  = _text_col(df_h, "Executante", "—").to_numpy()
+        td     = _text_col(df_h, "Tipo de Caso/Suporte", "").replace("", "N/A").to_numpy()
+        hora   = _date_col(df_h, "Criar hora").to_numpy()
+        ident  = _text_col(df_h, "Identificador", "")
+        id_tag = np.where(
+            ident.to_numpy() != "",
+            "<span style='font-size:.73rem;color:#8b949e;background:#21262d;padding:1px 8px;border-radius:10px;margin-left:6px'>"
+            + ident.to_numpy().astype(object) + "</span>",
+            "",
+        )
+        cards = (
+            "<div style='display:flex;gap:12px;align-items:flex-start;margin-bottom:0'>"
+            "<div style='display:flex;flex-direction:column;align-items:center;flex-shrink:0;width:14px;padding-top:4px'>"
+            "<div style='width:12px;height:12px;border-radius:50%;background:" + dot_c.astype(object)
+            + ";box-shadow:0 0 7px " + dot_g.astype(object) + ";flex-shrink:0'></div>"
+            + sep.astype(object) + "</div>"
+            "<div style='background:linear-gradient(145deg,#1c2333,#21262d);border:1px solid #30363d;border-radius:10px;padding:10px 14px;flex:1;margin-bottom:"
+            + mb.astype(object) + "'>"
+            "<div style='font-weight:600;font-size:.88rem;color:#e6edf3'>" + tarefa.astype(object) + " " + id_tag.astype(object) + "</div>"
+            "<div style='font-size:.78rem;color:#8b949e;margin-top:4px'>📅 " + hora.astype(object) + " &nbsp;|&nbsp; " + td.astype(object) + "</div>"
+            "<div style='font-size:.78rem;color:#79c0ff;margin-top:2px;font-weight:500'>👤 " + exec_.astype(object) + "</div>"
+            "</div></div>"
+        )
+        return "".join(cards)
+
     def _badge(status: str) -> str:
         s = str(status).lower()
         if any(k in s for k in ["resolv","concluíd","finaliz"]): cls = "sbadge-resolved"
@@ -450,16 +817,15 @@ if db_mode == "combined":
     total_ops  = len(df_cd)
     total_hist = len(df_hist_raw)
 
+    vinculo = load_link_report(cd_fp, hist_fp, COL_CD, COL_HIST, df_cd, df_hist_raw, key_codes)
+
     # Operações SEM nenhum registro de histórico
-    ops_sem_hist    = df_cd[df_cd["Qtd Histórico"] == 0].copy()
+    ops_sem_hist    = vinculo["ops_sem_hist"]
     n_ops_sem_hist  = len(ops_sem_hist)
 
     # Histórico cujas chaves NÃO existem na tabela de operações
-    chaves_cd       = set(df_cd[COL_CD].astype(str).str.strip())
-    chaves_hist_ser = df_hist_raw[COL_HIST].astype(str).str.strip()
-    mask_hist_sem   = ~chaves_hist_ser.isin(chaves_cd)
-    hist_sem_op     = df_hist_raw[mask_hist_sem].copy()
-    n_chaves_hist_sem = hist_sem_op[COL_HIST].nunique()
+    hist_sem_op       = vinculo["hist_sem_op"]
+    n_chaves_hist_sem = vinculo["n_chaves_hist_sem"]
 
     k1, k2, k3, k4 = st.columns(4)
     for col_k, icon, val, label, color in [
@@ -492,17 +858,14 @@ if db_mode == "combined":
         sel_tp   = st.multiselect("Tipo Operação", tipos_l, default=tipos_l, key="c_tp")
         srch     = st.text_input("🔎 Buscar ID / Razão Social", "", key="c_srch")
 
-    df_view = df_cd.copy()
+    df_view = df_cd
+    if srch.strip():
+        # Busca pelo índice de trigramas (sem acentos/maiúsculas)
+        hits = search(load_search_index(cd_fp, hist_fp, df_cd), srch)
+        df_view = df_view.iloc[hits]
     if sel_st: df_view = df_view[df_view["Status de caso"].isin(sel_st)]
     if sel_me: df_view = df_view[df_view["Código ME"].isin(sel_me)]
     if sel_tp: df_view = df_view[df_view["Tipo Operação"].isin(sel_tp)]
-    if srch.strip():
-        t = srch.strip().lower()
-        mask = pd.Series(False, index=df_view.index)
-        for c in ["ID do Caso","Razão Social","Nome Fantasia", COL_CD, "Operador"]:
-            if c in df_view.columns:
-                mask |= df_view[c].astype(str).str.lower().str.contains(t, na=False)
-        df_view = df_view[mask]
 
     # ── TAB 1 · Drill-down ───────────────────────────────────────────────────
     with tab_drill:
@@ -519,10 +882,18 @@ if db_mode == "combined":
             sel_id = st.selectbox("Selecione uma Operação:", ids_list, key="c_sel_id")
 
             resumo_cols = [c for c in ["ID do Caso","Status de caso","Nome Fantasia","Código ME","Valor ME","Data Criação","Qtd Histórico"] if c in df_view.columns]
-            df_res = df_view[resumo_cols].copy()
+            df_res = df_view[resumo_cols]
+            # Ciclo de vida do histórico de cada operação, alinhado pelos códigos de chave
+            ciclo = load_lifecycle((cd_fp, hist_fp), COL_HIST, "Criar hora", "Nome da Tarefa", "Executante",
+                                   df_hist_raw, key_codes)
+            ciclo_cols = [c for c in ["Último evento", "Duração total (h)", "Executantes distintos"] if c in ciclo.columns]
+            view_codes = key_codes["cd"][df_cd.index.get_indexer(df_view.index)]
+            df_res = df_res.assign(**{c: ciclo[c].reindex(view_codes).to_numpy() for c in ciclo_cols})
             if "Valor ME"    in df_res.columns: df_res["Valor ME"]    = df_res["Valor ME"].apply(_fmt_val)
             if "Data Criação" in df_res.columns: df_res["Data Criação"] = df_res["Data Criação"].apply(_fmt_date)
-            st.dataframe(df_res.reset_index(drop=True), use_container_width=True, height=420, hide_index=True)
+            st.dataframe(df_res.reset_index(drop=True), use_container_width=True, height=420, hide_index=True,
+                         column_config={"Duração total (h)": st.column_config.NumberColumn(format="%.1f"),
+                                        "Executantes distintos": st.column_config.NumberColumn(format="%d")})
 
         with col_right:
             st.markdown('<div class="section-header">📜 Histórico da Operação</div>', unsafe_allow_html=True)
@@ -573,7 +944,7 @@ if db_mode == "combined":
                 st.markdown("---")
 
                 # Histórico filtrado
-                df_h_op = df_hist_raw[df_hist_raw[COL_HIST].astype(str).str.strip() == chave].copy()
+                df_h_op = history_slice(*hist_index, chave)
 
                 if df_h_op.empty:
                     st.markdown("""
@@ -581,50 +952,22 @@ if db_mode == "combined":
                         ⚠️ Nenhum registro de histórico encontrado para esta operação.
                     </div>""", unsafe_allow_html=True)
                 else:
-                    if "Criar hora" in df_h_op.columns:
-                        df_h_op = df_h_op.sort_values("Criar hora", ascending=True)
-
                     st.markdown(f'<p style="color:#8b949e;font-size:.85rem;margin-bottom:10px">🔗 {len(df_h_op)} registro(s) vinculados</p>', unsafe_allow_html=True)
 
-                    col_task = "Nome da Tarefa"       if "Nome da Tarefa"       in df_h_op.columns else None
-                    col_hora = "Criar hora"            if "Criar hora"            in df_h_op.columns else None
-                    col_exec = "Executante"            if "Executante"            in df_h_op.columns else None
-                    col_tipo = "Tipo de Caso/Suporte" if "Tipo de Caso/Suporte" in df_h_op.columns else None
-                    col_ident= "Identificador"        if "Identificador"        in df_h_op.columns else None
-
+                    # Linha do tempo paginada, montada num único bloco HTML
                     n_h = len(df_h_op)
-                    for i, (_, row_h) in enumerate(df_h_op.iterrows()):
-                        tarefa  = str(row_h[col_task])  if col_task  else "—"
-                        hora    = _fmt_date(row_h[col_hora]) if col_hora else "—"
-                        exec_   = str(row_h[col_exec])  if col_exec  else "—"
-                        tipo_h  = str(row_h[col_tipo])  if col_tipo  else ""
-                        ident   = str(row_h[col_ident]) if col_ident else ""
-                        for v in [tarefa, exec_, tipo_h, ident]:
-                            pass
-                        if tarefa  == "nan": tarefa  = "—"
-                        if exec_   == "nan": exec_   = "—"
-                        if tipo_h  == "nan": tipo_h  = ""
-                        if ident   == "nan": ident   = ""
-
-                        dot_c = "#56d364" if i==0 else ("#f85149" if i==n_h-1 else "#388bfd")
-                        dot_g = "rgba(63,185,80,.5)" if i==0 else ("rgba(248,81,73,.5)" if i==n_h-1 else "rgba(56,139,253,.5)")
-                        sep   = "<div style='width:2px;background:#30363d;height:16px;margin:2px auto 0 auto'></div>" if i < n_h-1 else ""
-                        mb    = "8px" if i < n_h-1 else "0px"
-                        id_tag= f"<span style='font-size:.73rem;color:#8b949e;background:#21262d;padding:1px 8px;border-radius:10px;margin-left:6px'>{ident}</span>" if ident else ""
-                        td    = tipo_h if tipo_h else "N/A"
-
-                        card = (
-                            f"<div style='display:flex;gap:12px;align-items:flex-start;margin-bottom:0'>"
-                            f"<div style='display:flex;flex-direction:column;align-items:center;flex-shrink:0;width:14px;padding-top:4px'>"
-                            f"<div style='width:12px;height:12px;border-radius:50%;background:{dot_c};box-shadow:0 0 7px {dot_g};flex-shrink:0'></div>"
-                            f"{sep}</div>"
-                            f"<div style='background:linear-gradient(145deg,#1c2333,#21262d);border:1px solid #30363d;border-radius:10px;padding:10px 14px;flex:1;margin-bottom:{mb}'>"
-                            f"<div style='font-weight:600;font-size:.88rem;color:#e6edf3'>{tarefa} {id_tag}</div>"
-                            f"<div style='font-size:.78rem;color:#8b949e;margin-top:4px'>📅 {hora} &nbsp;|&nbsp; {td}</div>"
-                            f"<div style='font-size:.78rem;color:#79c0ff;margin-top:2px;font-weight:500'>👤 {exec_}</div>"
-                            f"</div></div>"
+                    n_tl_pages = -(-n_h // TIMELINE_PAGE_SIZE)
+                    tl_page = 1
+                    if n_tl_pages > 1:
+                        tl_page = st.number_input(
+                            f"Página da linha do tempo (de {n_tl_pages}, {TIMELINE_PAGE_SIZE} eventos por página)",
+                            min_value=1, max_value=n_tl_pages, value=1, step=1, key=f"c_tl_page_{sel_id}",
                         )
-                        st.markdown(card, unsafe_allow_html=True)
+                    tl_start = (int(tl_page) - 1) * TIMELINE_PAGE_SIZE
+                    st.markdown(
+                        _timeline_html(df_h_op.iloc[tl_start:tl_start + TIMELINE_PAGE_SIZE], tl_start, n_h),
+                        unsafe_allow_html=True,
+                    )
 
                     with st.expander("📑 Ver tabela do histórico"):
                         hist_disp = [c for c in ["Identificador", COL_HIST,"Nome da Tarefa","Criar hora","Executante","Tipo de Caso/Suporte","Atribuição decorrida"] if c in df_h_op.columns]
@@ -637,7 +980,7 @@ if db_mode == "combined":
         r1c1, r1c2 = st.columns(2)
         with r1c1:
             if "Status de caso" in df_view.columns:
-                sc = df_view["Status de caso"].value_counts().reset_index()
+                sc = df_view["Status de caso"].value_counts().loc[lambda s: s > 0].reset_index()
                 sc.columns = ["Status","Qtd"]
                 fig_s = px.bar(sc, x="Qtd", y="Status", orientation="h",
                                color="Qtd", color_continuous_scale=["#388bfd","#bc8cff"],
@@ -649,7 +992,7 @@ if db_mode == "combined":
 
         with r1c2:
             if "Tipo Operação" in df_view.columns:
-                tc = df_view["Tipo Operação"].value_counts().nlargest(10).reset_index()
+                tc = df_view["Tipo Operação"].value_counts().loc[lambda s: s > 0].nlargest(10).reset_index()
                 tc.columns = ["Tipo", "Qtd"]
                 fig_t = px.bar(tc, x="Tipo", y="Qtd", color="Qtd",
                                color_continuous_scale=["#388bfd", "#bc8cff"],
@@ -675,7 +1018,7 @@ if db_mode == "combined":
 
         with r2c2:
             if "Status de caso" in df_view.columns:
-                sc2 = df_view["Status de caso"].value_counts().reset_index()
+                sc2 = df_view["Status de caso"].value_counts().loc[lambda s: s > 0].reset_index()
                 sc2.columns = ["Status", "Qtd"]
                 fig_s2 = px.pie(sc2, values="Qtd", names="Status", hole=0.45,
                                 title="🔀 Distribuição por Status",
@@ -759,19 +1102,11 @@ if db_mode == "combined":
                 height=min(400, 60 + n_ops_sem_hist * 38),
             )
 
-            @st.cache_data
-            def _ops_sem_hist_excel(df):
-                buf = io.BytesIO()
-                with pd.ExcelWriter(buf, engine="openpyxl") as w:
-                    df.to_excel(w, index=False)
-                return buf.getvalue()
-
-            st.download_button(
-                "📥 Exportar Operações sem Histórico (Excel)",
-                data=_ops_sem_hist_excel(ops_sem_hist),
-                file_name=f"operacoes_sem_historico_{_dt2.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="down_ops_sem_hist",
+            render_export(
+                "📥 Exportar Operações sem Histórico (Excel)", "down_ops_sem_hist",
+                (cd_fp, hist_fp), "ops_sem_hist", "xlsx",
+                exports.frame_chunks(ops_sem_hist), n_ops_sem_hist,
+                f"operacoes_sem_historico_{_dt2.now().strftime('%Y%m%d_%H%M')}.xlsx",
             )
 
         st.markdown("---")
@@ -807,24 +1142,7 @@ if db_mode == "combined":
             )
 
             # Uma linha por chave única, com contagem de linhas e primeiros valores
-            _resumo_hist_sem = (
-                hist_sem_op
-                .groupby(COL_HIST)
-                .agg(**{"Qtd linhas no Histórico": (COL_HIST, "count")})
-                .reset_index()
-                .sort_values("Qtd linhas no Histórico", ascending=False)
-                .rename(columns={COL_HIST: "Chave do Caso (no Histórico)"})
-            )
-            for _ec in ["Tipo de Caso/Suporte", "Nome da Tarefa", "Executante", "Criar hora"]:
-                if _ec in hist_sem_op.columns:
-                    _fv = (
-                        hist_sem_op.dropna(subset=[COL_HIST])
-                        .groupby(COL_HIST)[_ec].first().reset_index()
-                        .rename(columns={COL_HIST: "Chave do Caso (no Histórico)"})
-                    )
-                    _resumo_hist_sem = _resumo_hist_sem.merge(
-                        _fv, on="Chave do Caso (no Histórico)", how="left"
-                    )
+            _resumo_hist_sem = vinculo["resumo_hist_sem_op"]
 
             st.markdown(
                 f'<p style="color:#8b949e;font-size:.85rem;margin-bottom:8px">'
@@ -840,53 +1158,82 @@ if db_mode == "combined":
                 height=min(420, 60 + n_chaves_hist_sem * 38),
             )
 
-            @st.cache_data
-            def _hist_sem_op_excel(df):
-                buf = io.BytesIO()
-                with pd.ExcelWriter(buf, engine="openpyxl") as w:
-                    df.to_excel(w, index=False)
-                return buf.getvalue()
-
-            st.download_button(
-                "📥 Exportar Histórico sem Operação (Excel)",
-                data=_hist_sem_op_excel(hist_sem_op),
-                file_name=f"historico_sem_operacao_{_dt2.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="down_hist_sem_op",
+            render_export(
+                "📥 Exportar Histórico sem Operação (Excel)", "down_hist_sem_op",
+                (cd_fp, hist_fp), "hist_sem_op", "xlsx",
+                exports.frame_chunks(hist_sem_op), len(hist_sem_op),
+                f"historico_sem_operacao_{_dt2.now().strftime('%Y%m%d_%H%M')}.xlsx",
             )
 
+            # Possíveis operações para as chaves sem vínculo (variações de espaço,
+            # caixa, pontuação ou ids truncados)
+            sugestoes = load_match_suggestions(cd_fp, hist_fp, vinculo, df_cd, COL_CD)
+            n_sug = sugestoes["Chave do Caso (no Histórico)"].nunique()
+            with st.expander(f"🧩 Sugestões de vínculo · {n_sug:,} de {n_chaves_hist_sem:,} chave(s) com candidata(s)"):
+                st.caption(
+                    "Similaridade 1.0 = mesma chave depois de normalizar espaços, maiúsculas e pontuação; "
+                    "abaixo disso, proporção de trigramas em comum entre as chaves."
+                )
+                st.dataframe(
+                    sugestoes, use_container_width=True, hide_index=True, height=min(420, 60 + len(sugestoes) * 38),
+                    column_config={"Similaridade": st.column_config.ProgressColumn(format="%.2f", min_value=0, max_value=1)},
+                )
+                render_export(
+                    "📥 Exportar sugestões de vínculo (Excel)", "down_sugestoes",
+                    (cd_fp, hist_fp), "sugestoes_vinculo", "xlsx",
+                    exports.frame_chunks(sugestoes), len(sugestoes),
+                    f"sugestoes_vinculo_{_dt2.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                )
+
     # ── TAB 3 · Tabela Combinada ──────────────────────────────────────────────
     with tab_table:
         st.markdown('<div class="section-header">🔗 Tabela Combinada (Operação × Histórico)</div>', unsafe_allow_html=True)
 
         hist_disp_cols = [c for c in ["Identificador", COL_HIST, "Nome da Tarefa","Criar hora","Executante","Tipo de Caso/Suporte"] if c in df_hist_raw.columns]
-        df_merged = df_view.merge(
-            df_hist_raw[hist_disp_cols],
-            left_on=COL_CD, right_on=COL_HIST,
-            how="left", suffixes=("","_hist"),
+        hist_sorted    = hist_index[0]
+        join_idx       = load_join_index(cd_fp, hist_fp, key_codes)
+        view_pos       = df_cd.index.get_indexer(df_view.index)
+
+        # Colunas do cruzamento (as do histórico que repetem nome levam "_hist")
+        merged_cols = df_cd.columns.tolist() + [c if c not in df_cd.columns else f"{c}_hist" for c in hist_disp_cols]
+        col_origin  = {c: ("cd", c) for c in df_cd.columns}
+        col_origin.update({m: ("hist", c) for m, c in zip(merged_cols[len(df_cd.columns):], hist_disp_cols)})
+
+        t1, t2, t3 = st.columns([2, 2, 1])
+        sort_c = t1.selectbox("Ordenar por:", merged_cols[:15], key="c_sort")
+        asc    = t2.radio("Ordem:", ["Crescente","Decrescente"], horizontal=True, key="c_asc") == "Crescente"
+        page_size = t3.selectbox("Linhas por página", TABLE_PAGE_SIZES, key="c_page_size")
+
+        side, src_col = col_origin[sort_c]
+        order, n_valid = load_sort_index(cd_fp, hist_fp, side, src_col, df_cd if side == "cd" else hist_sorted)
+        sort_by = (side, order, n_valid)
+
+        # Total sai das contagens por chave, sem montar o cruzamento
+        total_rows = int(np.maximum(df_view["Qtd Histórico"].to_numpy(), 1).sum())
+        n_pages    = max(1, -(-total_rows // page_size))
+        page = st.number_input(f"Página (de {n_pages:,})", min_value=1, max_value=n_pages, value=1, step=1, key="c_page")
+        first = (int(page) - 1) * page_size
+        df_page, _ = combined_rows(df_cd, view_pos, hist_sorted, hist_disp_cols, join_idx,
+                                   first, first + page_size, sort_by, asc)
+
+        st.caption(
+            f"{total_rows:,} linhas (operação × histórico) · "
+            f"exibindo {first + 1 if len(df_page) else 0:,}–{first + len(df_page):,}"
         )
+        st.dataframe(df_page, use_container_width=True, height=500, hide_index=True)
 
-        sort_c = st.selectbox("Ordenar por:", df_merged.columns.tolist()[:15], key="c_sort")
-        asc    = st.radio("Ordem:", ["Crescente","Decrescente"], horizontal=True, key="c_asc") == "Crescente"
-        df_merged = df_merged.sort_values(sort_c, ascending=asc)
-
-        st.caption(f"{len(df_merged):,} linhas (operação × histórico)")
-        st.dataframe(df_merged.reset_index(drop=True), use_container_width=True, height=500, hide_index=True)
-
-        @st.cache_data
-        def _to_excel(df):
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as w:
-                df.to_excel(w, index=False)
-            return buf.getvalue()
+        # O cruzamento completo só é montado no job de exportação, em blocos
+        def _merged_chunks():
+            for lo in range(0, max(total_rows, 1), exports.EXPORT_CHUNK_ROWS):
+                yield combined_rows(df_cd, view_pos, hist_sorted, hist_disp_cols, join_idx,
+                                    lo, lo + exports.EXPORT_CHUNK_ROWS, sort_by, asc)[0]
 
         from datetime import datetime as _dt
-        st.download_button(
-            "📥 Exportar para Excel",
-            data=_to_excel(df_merged),
-            file_name=f"operacoes_historico_{_dt.now().strftime('%Y%m%d_%H%M')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="c_down",
+        render_export(
+            "📥 Exportar para Excel", "c_down", (cd_fp, hist_fp),
+            {"view": parse_cache.content_hash(view_pos.tobytes()), "sort": sort_c, "asc": asc},
+            "xlsx", _merged_chunks, total_rows,
+            f"operacoes_historico_{_dt.now().strftime('%Y%m%d_%H%M')}.xlsx",
         )
 
     st.stop()   # não executar os modos A e B
@@ -909,10 +1256,11 @@ if db_mode == "history":
 
     total_rows       = len(df_raw)
     total_cols       = len(df_raw.columns)
-    operacoes_unicas = df_raw[col_hist].nunique()
-    hist_por_op      = df_raw[col_hist].value_counts()
-    null_series      = df_raw.isnull().sum()
-    null_pct_series  = (null_series / total_rows * 100).round(2)
+    hist_por_op, hist_por_op_df = load_history_counts(data_fp, col_hist, df_raw)
+    operacoes_unicas = hist_por_op.size
+    perfil           = load_profile(data_fp, df_raw)
+    null_series      = perfil.set_index("Coluna")["Nulos"]
+    null_pct_series  = perfil.set_index("Coluna")["% Nulos"]
     null_global      = float((null_series.sum() / (total_rows * total_cols)) * 100)
     cols_completas   = int((null_pct_series == 0).sum())
     cols_vazias      = int((null_pct_series == 100).sum())
@@ -920,10 +1268,12 @@ if db_mode == "history":
     date_min = df_raw[col_date].min()
     date_max = df_raw[col_date].max()
 
-    tab_visao, tab_tarefas, tab_operacoes, tab_qualidade = st.tabs([
+    tab_visao, tab_tarefas, tab_operacoes, tab_fluxo, tab_sla, tab_qualidade = st.tabs([
         "📊  Visão Geral",
         "⚙️  Tarefas & Executantes",
         "🔗  Por Operação",
+        "🔀  Fluxo de Tarefas",
+        "⏱️  SLA",
         "🔍  Qualidade dos Dados",
     ])
 
@@ -984,44 +1334,40 @@ if db_mode == "history":
 
         with colB:
             st.markdown('<div class="section-header history">Linha do Tempo de Eventos</div>', unsafe_allow_html=True)
-            ts = df_raw.copy()
-            ts["Hora"] = ts[col_date].dt.floor("H")
-            ts_grp = ts.groupby(["Hora", col_task]).size().reset_index(name="Eventos")
+            ts_grp, nivel = rollup_timeline(load_rollup(data_fp, col_date, col_task, df_raw), "tl_hist", col_task)
             fig_ts = px.line(
-                ts_grp, x="Hora", y="Eventos", color=col_task,
+                ts_grp, x="Período", y="Eventos", color=col_task,
                 color_discrete_map=TASK_COLOR_MAP,
                 template="plotly_dark", markers=False,
             )
             fig_ts.update_layout(
                 **PLOTLY_LAYOUT, height=340,
-                xaxis_title="", yaxis_title="Eventos/hora",
+                xaxis_title="", yaxis_title=f"Eventos/{nivel.lower()}",
                 legend=dict(**LEGEND_STYLE, title="Tarefa"),
             )
             st.plotly_chart(fig_ts, use_container_width=True)
 
         # ── Column overview
         st.markdown('<div class="section-header history">Visão das Colunas</div>', unsafe_allow_html=True)
-        col_info = []
-        for i, col in enumerate(df_raw.columns):
-            pct = float(null_pct_series[col])
-            n_uniq = int(df_raw[col].nunique(dropna=True))
-            col_info.append({
-                "Índice": i,
-                "Nome da Coluna": col,
-                "Tipo": str(df_raw[col].dtype),
-                "Únicos": n_uniq,
-                "Nulos": int(null_series[col]),
-                "% Nulos": pct,
-                "Status": "🚫 Vazia" if pct == 100 else ("✅ Completa" if pct == 0 else "🟡 Parcial"),
-            })
+        unicos = perfil["Únicos"].map("{:,}".format)
+        col_info = pd.DataFrame({
+            "Índice": range(len(perfil)),
+            "Nome da Coluna": perfil["Coluna"],
+            "Tipo": perfil["Tipo"],
+            "Únicos": unicos.mask(perfil["Únicos aprox."], "≈" + unicos),   # ≈: estimativa HyperLogLog
+            "Nulos": perfil["Nulos"],
+            "% Nulos": perfil["% Nulos"],
+            "Status": np.select([perfil["% Nulos"] == 100, perfil["% Nulos"] == 0],
+                                ["🚫 Vazia", "✅ Completa"], "🟡 Parcial"),
+            "Mais frequentes": perfil["Mais frequentes"],
+        })
         st.dataframe(
-            pd.DataFrame(col_info),
+            col_info,
             use_container_width=True,
             hide_index=True,
             column_config={
                 "% Nulos": st.column_config.ProgressColumn("% Nulos", min_value=0, max_value=100, format="%.1f%%"),
                 "Nulos": st.column_config.NumberColumn("Nulos", format="%d"),
-                "Únicos": st.column_config.NumberColumn("Únicos", format="%d"),
             },
         )
         # Warnings
@@ -1075,6 +1421,45 @@ if db_mode == "history":
         )
         st.plotly_chart(fig_exec, use_container_width=True)
 
+        # Carga de trabalho: casos abertos e vazão por executante (sweep-line, em cache)
+        st.markdown('<div class="section-header history">Carga de Trabalho por Executante</div>', unsafe_allow_html=True)
+        carga = load_workload(data_fp, col_hist, col_date, col_exec, df_raw)
+        w1, w2, w3 = st.columns([2, 2, 1])
+        execs_l  = carga["resumo"]["Executante"].tolist()
+        sel_exec = w1.multiselect("Executantes", execs_l, default=execs_l, key="wl_exec")
+        d0, d1   = date_min.date(), date_max.date()
+        if d0 < d1:
+            d0, d1 = w2.slider("Período", min_value=d0, max_value=d1, value=(d0, d1),
+                               format="DD/MM/YYYY", key="wl_range")
+        wl_nivel = w3.selectbox("Resolução", ["Automática", *ROLLUP_LEVELS], key="wl_level")
+        abertos, vazao, nivel = workload_series(
+            carga, pd.Timestamp(d0), pd.Timestamp(d1) + pd.Timedelta(days=1) - pd.Timedelta(minutes=1),
+            sel_exec, None if wl_nivel == "Automática" else wl_nivel,
+        )
+
+        colA, colB = st.columns(2)
+        with colA:
+            fig_ab = px.line(abertos, x="Período", y="Casos abertos", color="Executante",
+                             line_shape="hv", template="plotly_dark")
+            fig_ab.update_layout(**PLOTLY_LAYOUT, height=340, xaxis_title="",
+                                 yaxis_title=f"Casos abertos (máx./{nivel.lower()})",
+                                 legend=dict(**LEGEND_STYLE, title="Executante"))
+            st.plotly_chart(fig_ab, use_container_width=True)
+        with colB:
+            fig_vz = px.bar(vazao, x="Período", y="Casos encerrados", color="Executante", template="plotly_dark")
+            fig_vz.update_layout(**PLOTLY_LAYOUT, height=340, xaxis_title="",
+                                 yaxis_title=f"Casos encerrados/{nivel.lower()}",
+                                 legend=dict(**LEGEND_STYLE, title="Executante"))
+            st.plotly_chart(fig_vz, use_container_width=True)
+
+        resumo_wl = carga["resumo"][carga["resumo"]["Executante"].isin(sel_exec)]
+        st.dataframe(resumo_wl, use_container_width=True, hide_index=True,
+                     column_config={"Casos atendidos": st.column_config.NumberColumn(format="%d"),
+                                    "Pico de casos abertos": st.column_config.NumberColumn(format="%d")})
+        st.caption("Um caso fica aberto para o executante do primeiro ao último evento dele no caso, "
+                   "incluindo os dois instantes: um caso de um só evento conta no instante em que ocorreu. "
+                   "O pico é o maior valor da série, no período inteiro do arquivo.")
+
         # Tipo de Caso
         st.markdown('<div class="section-header history">Tipo de Caso/Suporte</div>', unsafe_allow_html=True)
         tipo_counts = df_raw[col_tipo].value_counts().reset_index()
@@ -1088,10 +1473,6 @@ if db_mode == "history":
     with tab_operacoes:
         st.markdown('<div class="section-header history">Registros por Operação</div>', unsafe_allow_html=True)
 
-        hist_por_op_df = hist_por_op.reset_index()
-        hist_por_op_df.columns = ["Operação", "Qtd. Registros de Histórico"]
-        hist_por_op_df["Índice"] = range(1, len(hist_por_op_df) + 1)
-
         # Summary cards
         m1, m2, m3, m4 = st.columns(4)
         m1.markdown(metric_card("🔗", f"{operacoes_unicas:,}", "Operações com Histórico", "purple"), unsafe_allow_html=True)
@@ -1116,20 +1497,32 @@ if db_mode == "history":
 
         # Drill-down: select operation
         st.markdown('<div class="section-header history">Detalhar uma Operação</div>', unsafe_allow_html=True)
-        operacoes_lista = sorted(df_raw[col_hist].unique().tolist())
-        sel_op = st.selectbox("Selecione uma Operação:", operacoes_lista)
-        df_op = df_raw[df_raw[col_hist] == sel_op].copy()
+        ciclo = load_lifecycle((file_fp, main_sheet), col_hist, col_date, col_task, col_exec, df_raw)
+        op_index = load_key_index(data_fp, col_hist, df_raw, hist_por_op, ciclo)
+        b1, b2 = st.columns([2, 1])
+        busca_op = b1.text_input("Buscar operação", "", key="op_busca",
+                                 placeholder="início de qualquer parte da chave, ex.: P-283")
+        ordem_op = b2.selectbox("Ordenar por", list(op_index["ordem"]), key="op_ordem")
+        # só os PICKER_LIMIT melhores resultados vão para o navegador
+        pos, n_encontradas = prefix_search(op_index, busca_op, PICKER_LIMIT, op_index["ordem"][ordem_op])
+        if not len(pos):
+            st.info("Nenhuma operação encontrada.")
+        else:
+            sel_op = st.selectbox(
+                f"Selecione uma Operação ({len(pos):,} de {n_encontradas:,}):", op_index["keys"][pos], key="op_sel",
+            )
+            df_op = history_slice(*load_history_index(file_fp, main_sheet, col_hist, col_date, df_raw), sel_op)
 
-        info_cols = st.columns(3)
-        info_cols[0].metric("Registros de histórico", len(df_op))
-        info_cols[1].metric("Período", f"{df_op[col_date].min().strftime('%H:%M:%S')} → {df_op[col_date].max().strftime('%H:%M:%S')}")
-        info_cols[2].metric("Duração", str(df_op[col_date].max() - df_op[col_date].min()).split('.')[0])
+            info_cols = st.columns(3)
+            info_cols[0].metric("Registros de histórico", len(df_op))
+            info_cols[1].metric("Período", f"{df_op[col_date].min().strftime('%H:%M:%S')} → {df_op[col_date].max().strftime('%H:%M:%S')}")
+            info_cols[2].metric("Duração", str(df_op[col_date].max() - df_op[col_date].min()).split('.')[0])
 
-        st.dataframe(
-            df_op[[col_hist, col_task, col_date, col_exec]].reset_index(drop=True),
-            use_container_width=True,
-            height=320,
-        )
+            st.dataframe(
+                df_op[[col_hist, col_task, col_date, col_exec]].reset_index(drop=True),
+                use_container_width=True,
+                height=320,
+            )
 
         # Table of all operations
         st.markdown('<div class="section-header history">Todas as Operações e Contagem</div>', unsafe_allow_html=True)
@@ -1140,13 +1533,131 @@ if db_mode == "history":
                          )
                      })
 
-        csv_bytes = hist_por_op_df.to_csv(index=False).encode("utf-8-sig")
-        st.download_button(
-            "⬇️ Exportar contagem por operação (CSV)",
-            data=csv_bytes, file_name="historico_por_operacao.csv", mime="text/csv",
+        render_export(
+            "⬇️ Exportar contagem por operação (CSV)", "down_hist_por_op", data_fp,
+            "hist_por_op", "csv", exports.frame_chunks(hist_por_op_df), len(hist_por_op_df),
+            "historico_por_operacao.csv",
+        )
+
+        # Ciclo de vida de todas as operações (carregado acima)
+        st.markdown('<div class="section-header history">Ciclo de Vida das Operações</div>', unsafe_allow_html=True)
+        task_cols = [c for c in ciclo.columns if c.startswith(LIFECYCLE_TASK_PREFIX)]
+
+        f1, f2, f3, f4 = st.columns([1.4, 1.4, 1, 1.2])
+        lc_busca  = f1.text_input("Filtrar operação", "", key="lc_busca")
+        lc_tarefa = f2.multiselect("Com eventos de", [c[len(LIFECYCLE_TASK_PREFIX):] for c in task_cols], key="lc_tarefa")
+        lc_min_h  = f3.number_input("Duração mínima (h)", min_value=0.0, value=0.0, step=24.0, key="lc_min_h")
+        lc_sort   = f4.selectbox("Ordenar por", list(ciclo.columns), index=list(ciclo.columns).index("Duração total (h)"), key="lc_sort")
+        lc_asc    = f4.toggle("Crescente", value=False, key="lc_asc")
+
+        mask = ciclo["Duração total (h)"].fillna(0).to_numpy() >= lc_min_h
+        if lc_busca.strip():
+            mask &= ciclo["Operação"].astype(str).str.contains(lc_busca.strip(), case=False, regex=False).to_numpy()
+        for tarefa in lc_tarefa:
+            mask &= ciclo[f"{LIFECYCLE_TASK_PREFIX}{tarefa}"].to_numpy() > 0
+        ciclo_view = ciclo[mask].sort_values(lc_sort, ascending=lc_asc, kind="stable", na_position="last")
+
+        st.caption(f"{len(ciclo_view):,} de {len(ciclo):,} operações · intervalos entre eventos consecutivos de '{col_date}'")
+        st.dataframe(
+            ciclo_view, use_container_width=True, hide_index=True, height=420,
+            column_config={c: st.column_config.NumberColumn(format="%.1f")
+                           for c in ["Duração total (h)", "Maior intervalo (h)", "Intervalo médio (h)"]},
+        )
+
+        render_export(
+            "⬇️ Exportar ciclo de vida (CSV)", "down_ciclo", data_fp,
+            {"ciclo": [lc_busca.strip(), lc_tarefa, lc_min_h, lc_sort, lc_asc]}, "csv",
+            exports.frame_chunks(ciclo_view), len(ciclo_view), "ciclo_de_vida_operacoes.csv",
+        )
+
+    # ── TAB 4 · Fluxo de Tarefas ─────────────────────────────────────────────
+    with tab_fluxo:
+        st.markdown('<div class="section-header history">Transições entre Tarefas</div>', unsafe_allow_html=True)
+        fluxo = load_process_map(data_fp, col_hist, col_date, col_task, df_raw)
+        trans, variantes = fluxo["transicoes"], fluxo["variantes"]
+
+        p1, p2, p3 = st.columns(3)
+        p1.markdown(metric_card("🔀", f"{len(trans):,}", "Transições Distintas", "purple"), unsafe_allow_html=True)
+        p2.markdown(metric_card("🧭", f"{fluxo['n_variantes']:,}", "Caminhos Distintos", "blue"), unsafe_allow_html=True)
+        p3.markdown(metric_card("🏆", f"{variantes['% Casos'].iloc[0]:.1f}%" if len(variantes) else "—",
+                                "Casos no Caminho mais Comum", "green"), unsafe_allow_html=True)
+
+        # Sankey: tarefas de origem à esquerda e de destino à direita (evita ciclos no diagrama)
+        max_trans = int(trans["Transições"].max()) if len(trans) else 1
+        min_trans = 1
+        if max_trans > 1:
+            min_trans = st.slider("Ocultar transições com menos de", 1, max_trans, 1, key="pm_min")
+        vis = trans[trans["Transições"] >= min_trans]
+        origem, destino = pd.Index(vis["De"].unique()), pd.Index(vis["Para"].unique())
+        nomes = [*origem, *destino]
+        fig_sk = go.Figure(go.Sankey(
+            node=dict(label=nomes, pad=18, thickness=16, line=dict(color="#0d1117", width=1),
+                      color=[TASK_COLOR_MAP.get(n, "#6e7681") for n in nomes]),
+            link=dict(
+                source=origem.get_indexer(vis["De"]), target=len(origem) + destino.get_indexer(vis["Para"]),
+                value=vis["Transições"],
+                customdata=(vis["Mediana (h)"].round(1).astype(str) + " h").mask(vis["Mediana (h)"].isna(), "—"),
+                hovertemplate="%{source.label} → %{target.label}<br>%{value:,} transições"
+                              "<br>Mediana: %{customdata}<extra></extra>",
+            ),
+        ))
+        fig_sk.update_layout(**PLOTLY_LAYOUT, height=420)
+        st.plotly_chart(fig_sk, use_container_width=True)
+
+        st.dataframe(trans, use_container_width=True, hide_index=True,
+                     column_config={"Mediana (h)": st.column_config.NumberColumn(format="%.2f")})
+
+        st.markdown('<div class="section-header history">Caminhos mais Frequentes</div>', unsafe_allow_html=True)
+        st.dataframe(variantes, use_container_width=True, hide_index=True,
+                     column_config={"% Casos": st.column_config.ProgressColumn(format="%.2f%%", min_value=0, max_value=100)})
+        render_export(
+            "⬇️ Exportar transições (CSV)", "down_transicoes", data_fp, "transicoes", "csv",
+            exports.frame_chunks(trans), len(trans), "transicoes_tarefas.csv",
+        )
+
+    # ── TAB 5 · SLA ──────────────────────────────────────────────────────────
+    with tab_sla:
+        st.markdown('<div class="section-header history">SLA por Caso</div>', unsafe_allow_html=True)
+        sla = load_sla(data_fp, col_hist, col_date, col_task, col_exec, col_tipo, df_raw)
+        casos_sla = sla["casos"]
+
+        s1, s2, s3, s4 = st.columns(4)
+        h_exec = casos_sla["Horas até ExecuteSLA"]
+        s1.markdown(metric_card("⚙️", f"{int(h_exec.notna().sum()):,}", "Casos com ExecuteSLA", "blue"), unsafe_allow_html=True)
+        s2.markdown(metric_card("⏱️", f"{h_exec.median():.1f} h" if h_exec.notna().any() else "—", "Mediana até ExecuteSLA", "purple"), unsafe_allow_html=True)
+        s3.markdown(metric_card("🎯", f"{casos_sla['Meta antes do prazo'].mean() * 100:.1f}%" if len(casos_sla) else "—", "Meta antes do prazo", "green"), unsafe_allow_html=True)
+        s4.markdown(metric_card("🚨", f"{int(casos_sla['Prazo estourado'].sum()):,}", "Prazos estourados", "red"), unsafe_allow_html=True)
+
+        colA, colB = st.columns(2)
+        for col_ui, tabela, eixo, titulo in [
+            (colA, sla["por_executante"], "Executante no prazo", "Estouros por Executante"),
+            (colB, sla["por_tipo"], col_tipo, "Estouros por Tipo de Caso"),
+        ]:
+            with col_ui:
+                st.markdown(f'<div class="section-header history">{titulo}</div>', unsafe_allow_html=True)
+                fig_sla = px.bar(
+                    tabela, x=eixo, y=["Estouros", "Meta antes do prazo"], barmode="group",
+                    color_discrete_sequence=[TASK_COLOR_MAP["CheckSLADeadline"], TASK_COLOR_MAP["CheckSLAGoal"]],
+                    template="plotly_dark",
+                )
+                fig_sla.update_layout(**PLOTLY_LAYOUT, height=320, xaxis_title="", yaxis_title="Casos",
+                                      legend=dict(**LEGEND_STYLE, title=""))
+                st.plotly_chart(fig_sla, use_container_width=True)
+                st.dataframe(tabela, use_container_width=True, hide_index=True,
+                             column_config={"% Estouro": st.column_config.NumberColumn(format="%.2f%%")})
+
+        st.markdown('<div class="section-header history">Casos</div>', unsafe_allow_html=True)
+        so_estouro = st.toggle("Somente prazos estourados", value=False, key="sla_estouro")
+        casos_view = casos_sla[casos_sla["Prazo estourado"]] if so_estouro else casos_sla
+        st.caption(f"{len(casos_view):,} de {len(casos_sla):,} casos · abertura = primeiro evento do caso no histórico")
+        st.dataframe(casos_view, use_container_width=True, hide_index=True, height=420,
+                     column_config={"Horas até ExecuteSLA": st.column_config.NumberColumn(format="%.1f")})
+        render_export(
+            "⬇️ Exportar SLA por caso (CSV)", "down_sla", data_fp, {"sla": so_estouro}, "csv",
+            exports.frame_chunks(casos_view), len(casos_view), "sla_por_caso.csv",
         )
 
-    # ── TAB 4 · Qualidade dos Dados ──────────────────────────────────────────
+    # ── TAB 6 · Qualidade dos Dados ──────────────────────────────────────────
     with tab_qualidade:
         st.markdown('<div class="section-header history">Diagnóstico de Qualidade · Pré-Migração</div>', unsafe_allow_html=True)
 
@@ -1172,7 +1683,7 @@ if db_mode == "history":
 
         # Per-column detail
         st.markdown('<div class="section-header history">Estatísticas por Coluna</div>', unsafe_allow_html=True)
-        render_quality_table(df_raw, total_rows)
+        render_quality_table(perfil, total_rows)
 
         # Migration recommendations
         st.markdown('<div class="section-header history">Recomendações para Migração</div>', unsafe_allow_html=True)
@@ -1195,10 +1706,11 @@ if db_mode == "history":
             unsafe_allow_html=True,
         )
 
-        csv_stats = pd.DataFrame({"Coluna": null_pct_series.index, "% Nulos": null_pct_series.values,
-                                   "Nulos": null_series.values, "Total": total_rows}).to_csv(index=False).encode("utf-8-sig")
-        st.download_button("⬇️ Exportar relatório de qualidade (CSV)", data=csv_stats,
-                           file_name="qualidade_historico.csv", mime="text/csv")
+        stats_hist = pd.DataFrame({"Coluna": null_pct_series.index, "% Nulos": null_pct_series.values,
+                                   "Nulos": null_series.values, "Total": total_rows})
+        render_export("⬇️ Exportar relatório de qualidade (CSV)", "down_quality_hist", data_fp,
+                      "qualidade", "csv", exports.frame_chunks(stats_hist), len(stats_hist),
+                      "qualidade_historico.csv")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1212,10 +1724,12 @@ else:
 
     total_rows = len(df_raw)
     total_cols = len(df_raw.columns)
-    null_total = int(df_raw.isnull().sum().sum())
+    perfil     = load_profile(data_fp, df_raw)
+    uniq       = perfil.set_index("Coluna")["Únicos"]
+    null_total = int(perfil["Nulos"].sum())
     null_pct   = null_total / (total_rows * total_cols) * 100 if total_rows else 0
     dup_count  = int(df_raw[id_col].duplicated().sum())
-    empty_cols = int((df_raw.isnull().mean() == 1).sum())
+    empty_cols = int((perfil["% Nulos"] == 100).sum()) if total_rows else 0
 
     tab_visao, tab_tabela, tab_qualidade, tab_graficos = st.tabs([
         "📊  Visão Geral",
@@ -1237,7 +1751,7 @@ else:
             date_range = f"{df_raw[date_col].min().strftime('%d/%m/%y')} – {df_raw[date_col].max().strftime('%d/%m/%y')}"
             c6.markdown(metric_card("📅", date_range, "Período", "teal"), unsafe_allow_html=True)
         else:
-            c6.markdown(metric_card("🆔", f"{df_raw[id_col].nunique():,}", "IDs Únicos", "teal"), unsafe_allow_html=True)
+            c6.markdown(metric_card("🆔", f"{'≈' if perfil['Únicos aprox.'].iloc[0] else ''}{uniq[id_col]:,}", "IDs Únicos", "teal"), unsafe_allow_html=True)
 
         colA, colB = st.columns([1, 1.5])
         with colA:
@@ -1263,14 +1777,13 @@ else:
         with colB:
             st.markdown('<div class="section-header">Registros ao Longo do Tempo</div>', unsafe_allow_html=True)
             if date_col:
-                ts = df_raw.copy()
-                ts["Mês"] = ts[date_col].dt.to_period("M").dt.to_timestamp()
-                ts_grp = ts.groupby("Mês").size().reset_index(name="Registros")
-                fig_ts = px.area(ts_grp, x="Mês", y="Registros",
+                ts_grp, nivel = rollup_timeline(load_rollup(data_fp, date_col, None, df_raw), "tl_ops")
+                ts_grp = ts_grp.rename(columns={"Eventos": "Registros"})
+                fig_ts = px.area(ts_grp, x="Período", y="Registros",
                                  color_discrete_sequence=["#388bfd"], template="plotly_dark")
                 fig_ts.update_traces(line=dict(width=2.5), fillcolor="rgba(56,139,253,.15)")
                 fig_ts.update_layout(**PLOTLY_LAYOUT, height=380, xaxis_title="",
-                                     yaxis_title="Nº de Registros", legend=LEGEND_STYLE)
+                                     yaxis_title=f"Nº de Registros/{nivel.lower()}", legend=LEGEND_STYLE)
                 st.plotly_chart(fig_ts, use_container_width=True)
             else:
                 st.info("Coluna de data não detectada.")
@@ -1286,8 +1799,10 @@ else:
     # ── TAB 2 · Tabela & Filtros ─────────────────────────────────────────────
     with tab_tabela:
         st.markdown('<div class="section-header">Filtros Interativos</div>', unsafe_allow_html=True)
-        df_filtered = df_raw.copy()
-        cat_cols = [c for c in df_raw.columns if df_raw[c].dtype == object and 1 < df_raw[c].nunique() <= 50]
+        df_filtered = df_raw
+        cat_cols = [c for c in df_raw.columns
+                    if (df_raw[c].dtype == object or isinstance(df_raw[c].dtype, pd.CategoricalDtype))
+                    and 1 < uniq[c] <= 50]
 
         fc = st.columns(min(len(cat_cols), 4))
         active_filters: dict = {}
@@ -1339,15 +1854,15 @@ else:
             selected_cols = st.multiselect("Colunas:", df_filtered.columns.tolist(), default=df_filtered.columns.tolist()[:15])
         display_df = df_filtered[selected_cols] if selected_cols else df_filtered
         st.dataframe(display_df, use_container_width=True, height=480)
-        st.download_button("⬇️ Exportar resultado filtrado (CSV)",
-                           data=df_filtered.to_csv(index=False).encode("utf-8-sig"),
-                           file_name="cambio_filtrado.csv", mime="text/csv")
+        render_export("⬇️ Exportar resultado filtrado (CSV)", "down_filtered", data_fp,
+                      parse_cache.content_hash(df_filtered.index.to_numpy().tobytes()),
+                      "csv", exports.frame_chunks(df_filtered), len(df_filtered),
+                      "cambio_filtrado.csv")
 
     # ── TAB 3 · Qualidade dos Dados ──────────────────────────────────────────
     with tab_qualidade:
         st.markdown('<div class="section-header">Diagnóstico de Qualidade · Pré-Migração</div>', unsafe_allow_html=True)
-        null_series     = df_raw.isnull().sum()
-        null_pct_series = (null_series / total_rows * 100).round(2)
+        null_pct_series = perfil.set_index("Coluna")["% Nulos"]
 
         q1, q2, q3, q4 = st.columns(4)
         cols_complete = int((null_pct_series == 0).sum())
@@ -1368,20 +1883,17 @@ else:
         st.plotly_chart(fig_bar, use_container_width=True)
 
         sort_opt = st.selectbox("Ordenar por:", ["% de Nulos (↓)", "% de Nulos (↑)", "Nome da Coluna A-Z", "Tipo de Dado"])
-        stats_rows = [{"Coluna": c, "Tipo": str(df_raw[c].dtype), "Nulos": int(null_series[c]),
-                       "% Nulos": float(null_pct_series[c]), "Únicos": int(df_raw[c].nunique(dropna=True)),
-                       "Preenchidos": total_rows - int(null_series[c])} for c in df_raw.columns]
-        stats_df = pd.DataFrame(stats_rows)
+        stats_df = column_quality(df_raw, perfil)
         if sort_opt == "% de Nulos (↓)":         stats_df = stats_df.sort_values("% Nulos", ascending=False)
         elif sort_opt == "% de Nulos (↑)":        stats_df = stats_df.sort_values("% Nulos")
         elif sort_opt == "Nome da Coluna A-Z":     stats_df = stats_df.sort_values("Coluna")
         else:                                      stats_df = stats_df.sort_values("Tipo")
 
-        render_quality_table(df_raw.reindex(columns=stats_df["Coluna"]), total_rows)
+        render_quality_table(perfil.set_index("Coluna").loc[stats_df["Coluna"]].reset_index(), total_rows)
 
-        st.download_button("⬇️ Exportar relatório de qualidade (CSV)",
-                           data=stats_df.to_csv(index=False).encode("utf-8-sig"),
-                           file_name="qualidade_colunas.csv", mime="text/csv")
+        render_export("⬇️ Exportar relatório de qualidade (CSV)", "down_quality_ops", data_fp,
+                      {"qualidade": sort_opt}, "csv", exports.frame_chunks(stats_df), len(stats_df),
+                      "qualidade_colunas.csv")
 
     # ── TAB 4 · Gráficos Detalhados ──────────────────────────────────────────
     with tab_graficos:
@@ -1405,19 +1917,18 @@ else:
 
         if date_col and status_col:
             st.markdown("#### 📅 Evolução Temporal por Status")
-            ts2 = df_raw.copy()
-            ts2["Mês"] = ts2[date_col].dt.to_period("M").dt.to_timestamp()
-            ts2_grp = ts2.groupby(["Mês", status_col]).size().reset_index(name="Registros")
-            top_s = df_raw[status_col].value_counts().head(7).index.tolist()
+            ts2_grp, nivel = rollup_timeline(load_rollup(data_fp, date_col, status_col, df_raw), "tl_status", status_col)
+            ts2_grp = ts2_grp.rename(columns={"Eventos": "Registros"})
+            top_s = ts2_grp.groupby(status_col)["Registros"].sum().nlargest(7).index
             ts2_grp = ts2_grp[ts2_grp[status_col].isin(top_s)]
-            fig_ts2 = px.line(ts2_grp, x="Mês", y="Registros", color=status_col,
+            fig_ts2 = px.line(ts2_grp, x="Período", y="Registros", color=status_col,
                               color_discrete_map=STATUS_COLOR_MAP, template="plotly_dark", markers=True)
-            fig_ts2.update_layout(**PLOTLY_LAYOUT, height=400, xaxis_title="", yaxis_title="Nº de Registros",
+            fig_ts2.update_layout(**PLOTLY_LAYOUT, height=400, xaxis_title="", yaxis_title=f"Nº de Registros/{nivel.lower()}",
                                   legend=dict(**LEGEND_STYLE, orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
             st.plotly_chart(fig_ts2, use_container_width=True)
 
         nome_col = next((c for c in df_raw.columns if "nome" in c.lower() or "fantasia" in c.lower()), None)
-        if nome_col and df_raw[nome_col].nunique() > 1:
+        if nome_col and uniq[nome_col] > 1:
             st.markdown(f"#### 🏢 Top 15 · {nome_col}")
             tc = df_raw[nome_col].value_counts().head(15).reset_index()
             tc.columns = [nome_col, "Qtd"]
@@ -1429,7 +1940,8 @@ else:
             st.plotly_chart(fig_cli, use_container_width=True)
 
         num_cols = df_raw.select_dtypes(include=[np.number]).columns.tolist()
-        useful_num = [c for c in num_cols if df_raw[c].nunique() > 5 and df_raw[c].notna().sum() > 50]
+        preenchidos = perfil.set_index("Coluna")["Preenchidos"]
+        useful_num = [c for c in num_cols if uniq[c] > 5 and preenchidos[c] > 50]
         if useful_num:
             st.markdown("#### 📐 Distribuição de Valores Numéricos")
             sel_num  = st.selectbox("Selecione a coluna numérica:", useful_num)
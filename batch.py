@@ -0,0 +1,229 @@
+"""Execução em lote, sem Streamlit, das análises do dashboard.
+
+Recebe arquivos ControleDiario e pxGetWorkHistory (ou diretórios com eles),
+forma os pares pelo sufixo do nome do arquivo e, para cada par, grava os
+mesmos relatórios do app (validação de vínculo e sugestões de vínculo,
+qualidade por coluna, histórico por operação, ciclo de vida, SLA, carga por
+executante, transições entre tarefas) e um kpis.json. Os pares são
+processados em paralelo.
+
+Exemplo:
+    python batch.py --cd exports/ --hist exports/ --out relatorios/ --formats xlsx,csv
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import parse_cache
+from analytics import (
+    COL_CHAVE_CD, COL_CHAVE_HIST, case_lifecycle, case_sla, column_quality, encode_keys,
+    executor_workload, history_per_operation, kpi_summary, link_validation, merge_history_counts,
+    process_map, sla_breaches,
+)
+from loaders import SUPPORTED_EXTENSIONS, read_keyed_sheet, read_sheet, sheet_catalogue
+from search import suggest_matches
+
+FORMATS = ("xlsx", "csv", "parquet")
+
+CD_PREFIX   = "controlediario"
+HIST_PREFIX = "pxgetworkhistory"
+
+
+def _expand(paths: list) -> list:
+    files = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            files.extend(sorted(f for f in p.iterdir() if f.suffix.lower().lstrip(".") in SUPPORTED_EXTENSIONS))
+        elif p.is_file():
+            files.append(p)
+        else:
+            raise SystemExit(f"Arquivo ou diretório não encontrado: {p}")
+    return files
+
+
+def _pair_token(path: Path, prefix: str) -> str:
+    stem = path.stem.lower()
+    if stem.startswith(prefix):
+        stem = stem[len(prefix):]
+    return re.sub(r"^[\s_\-.]+|[\s_\-.]+$", "", stem) or path.stem
+
+
+def build_jobs(cd_files: list, hist_files: list) -> list:
+    """Pares (ControleDiario, pxGetWorkHistory) pelo sufixo do nome; arquivos
+    sem par viram jobs de um arquivo só. Um único arquivo de cada tipo é
+    sempre pareado."""
+    # Um diretório passado em --cd e --hist ao mesmo tempo: separa pelo prefixo
+    cd_files   = [f for f in cd_files if not f.stem.lower().startswith(HIST_PREFIX)]
+    hist_files = [f for f in hist_files if not f.stem.lower().startswith(CD_PREFIX)]
+
+    if len(cd_files) == 1 and len(hist_files) == 1:
+        name = _pair_token(cd_files[0], CD_PREFIX)
+        return [{"name": name, "cd": cd_files[0], "hist": hist_files[0]}]
+
+    hist_by_token = {_pair_token(f, HIST_PREFIX): f for f in hist_files}
+    jobs = []
+    for f in cd_files:
+        token = _pair_token(f, CD_PREFIX)
+        jobs.append({"name": token, "cd": f, "hist": hist_by_token.pop(token, None)})
+    for token, f in hist_by_token.items():
+        jobs.append({"name": token, "cd": None, "hist": f})
+    return jobs
+
+
+def _read_main_sheet(file_bytes: bytes, cache_key) -> pd.DataFrame:
+    """Planilha com mais linhas, como a escolhida por padrão no app."""
+    sheet = max(sheet_catalogue(file_bytes), key=lambda s: s["rows"])["name"]
+    df = parse_cache.load_sheet(cache_key, sheet) if cache_key else None
+    if df is None:
+        df = read_sheet(file_bytes, sheet)
+        if cache_key:
+            parse_cache.save_sheets(cache_key, {sheet: df}, complete=False)
+    return df
+
+
+def write_report(df: pd.DataFrame, stem: Path, formats) -> list:
+    written = []
+    for fmt in formats:
+        path = stem.with_suffix(f".{fmt}")
+        if fmt == "xlsx":
+            with pd.ExcelWriter(path, engine="openpyxl") as w:
+                df.to_excel(w, index=False)
+        elif fmt == "csv":
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+        elif fmt == "parquet":
+            try:
+                df.to_parquet(path, index=False)
+            except (pa.ArrowException, ValueError, TypeError):
+                # colunas com tipos misturados: grava como texto
+                obj = df.select_dtypes(include="object").columns
+                df.astype({c: str for c in obj}).to_parquet(path, index=False)
+        written.append(str(path))
+    return written
+
+
+def run_job(job: dict, out_dir: str, formats, use_cache: bool = True) -> dict:
+    """Processa um par (ou arquivo avulso) e grava relatórios em out_dir/<nome>/."""
+    started = time.time()
+    dest = Path(out_dir) / job["name"]
+    dest.mkdir(parents=True, exist_ok=True)
+
+    def _bytes(path):
+        data = Path(path).read_bytes()
+        return data, (parse_cache.content_hash(data) if use_cache else None)
+
+    df_cd = df_hist = validation = None
+    if job["cd"] and job["hist"]:
+        cd_bytes, cd_key     = _bytes(job["cd"])
+        hist_bytes, hist_key = _bytes(job["hist"])
+        df_cd   = read_keyed_sheet(cd_bytes, COL_CHAVE_CD, cd_key)
+        df_hist = read_keyed_sheet(hist_bytes, COL_CHAVE_HIST, hist_key)
+        del cd_bytes, hist_bytes
+        keys = encode_keys(df_cd, df_hist)
+        df_cd = merge_history_counts(df_cd, df_hist, keys=keys)
+        validation = link_validation(df_cd, df_hist, keys=keys)
+    elif job["cd"]:
+        df_cd = _read_main_sheet(*_bytes(job["cd"]))
+    else:
+        df_hist = _read_main_sheet(*_bytes(job["hist"]))
+
+    outputs = []
+    if validation is not None:
+        outputs += write_report(validation["ops_sem_hist"], dest / "operacoes_sem_historico", formats)
+        outputs += write_report(validation["hist_sem_op"], dest / "historico_sem_operacao", formats)
+        outputs += write_report(validation["resumo_hist_sem_op"], dest / "historico_sem_operacao_resumo", formats)
+        labels = df_cd["ID do Caso"] if "ID do Caso" in df_cd.columns else None
+        outputs += write_report(suggest_matches(validation["chaves_hist_sem"], df_cd[COL_CHAVE_CD], labels),
+                                dest / "sugestoes_vinculo", formats)
+    if df_cd is not None:
+        outputs += write_report(column_quality(df_cd), dest / "qualidade_operacoes", formats)
+    if df_hist is not None:
+        outputs += write_report(column_quality(df_hist), dest / "qualidade_historico", formats)
+        col_hist = COL_CHAVE_HIST if COL_CHAVE_HIST in df_hist.columns else df_hist.columns[0]
+        outputs += write_report(history_per_operation(df_hist, col_hist), dest / "historico_por_operacao", formats)
+        outputs += write_report(case_lifecycle(df_hist, col_hist), dest / "ciclo_de_vida", formats)
+        if "Executante" in df_hist.columns and "Criar hora" in df_hist.columns:
+            outputs += write_report(executor_workload(df_hist, col_hist)["resumo"], dest / "carga_executantes", formats)
+        if "Nome da Tarefa" in df_hist.columns:
+            fluxo = process_map(df_hist, col_hist)
+            outputs += write_report(fluxo["transicoes"], dest / "transicoes_tarefas", formats)
+            outputs += write_report(fluxo["variantes"], dest / "variantes_caminho", formats)
+        sla = case_sla(df_hist, col_hist)
+        outputs += write_report(sla, dest / "sla_por_caso", formats)
+        if "Executante no prazo" in sla.columns:
+            outputs += write_report(sla_breaches(sla, "Executante no prazo"), dest / "sla_por_executante", formats)
+        if "Tipo de Caso/Suporte" in sla.columns:
+            outputs += write_report(sla_breaches(sla, "Tipo de Caso/Suporte"), dest / "sla_por_tipo", formats)
+
+    kpis = kpi_summary(df_cd, df_hist, validation)
+    result = {
+        "job": job["name"],
+        "arquivo_operacoes": str(job["cd"]) if job["cd"] else None,
+        "arquivo_historico": str(job["hist"]) if job["hist"] else None,
+        "kpis": kpis,
+        "relatorios": outputs,
+        "segundos": round(time.time() - started, 2),
+    }
+    with open(dest / "kpis.json", "w", encoding="utf-8") as fh:
+        json.dump(result, fh, ensure_ascii=False, indent=2)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Gera os KPIs e relatórios do dashboard CambioBix sem abrir o Streamlit.",
+    )
+    parser.add_argument("--cd", nargs="*", default=[], help="Arquivos ou diretórios ControleDiario")
+    parser.add_argument("--hist", nargs="*", default=[], help="Arquivos ou diretórios pxGetWorkHistory")
+    parser.add_argument("--out", required=True, help="Diretório de saída")
+    parser.add_argument("--formats", default="xlsx,csv",
+                        help=f"Formatos dos relatórios, separados por vírgula ({', '.join(FORMATS)})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Nº de processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--no-cache", action="store_true", help="Não usar o cache em disco das planilhas")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        parser.error(f"formato(s) inválido(s): {', '.join(bad)}")
+    if not args.cd and not args.hist:
+        parser.error("informe ao menos um arquivo em --cd ou --hist")
+
+    jobs = build_jobs(_expand(args.cd), _expand(args.hist))
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        futures = {pool.submit(run_job, job, args.out, formats, not args.no_cache): job for job in jobs}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                res = fut.result()
+                results.append(res)
+                print(f"✓ {job['name']} ({res['segundos']}s)")
+            except Exception as exc:
+                failures.append({"job": job["name"], "erro": repr(exc),
+                                 "detalhe": "".join(traceback.format_exception(exc))})
+                print(f"✗ {job['name']}: {exc!r}", file=sys.stderr)
+
+    summary = {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "jobs": sorted(results, key=lambda r: r["job"]),
+        "falhas": failures,
+    }
+    with open(Path(args.out) / "summary.json", "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
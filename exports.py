@@ -0,0 +1,185 @@
+"""Exportações sob demanda, geradas em segundo plano e guardadas em disco.
+
+Um clique em "exportar" dispara um job numa thread: as linhas chegam em blocos
+(um DataFrame por vez) e vão direto para o arquivo, com o openpyxl em modo
+write-only no XLSX ou anexando ao CSV, de modo que a memória não cresce com o
+tamanho da exportação. O arquivo pronto fica em disco, endereçado por
+(fingerprint dos dados, estado dos filtros, formato); pedir a mesma exportação
+de novo, em qualquer sessão, devolve o arquivo já gerado.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+
+EXPORT_DIR = Path(os.environ.get("CAMBIOBIX_EXPORT_DIR", Path.home() / ".cache" / "cambiobix" / ".exports"))
+EXPORT_MAX_BYTES = int(os.environ.get("CAMBIOBIX_EXPORT_MAX_MB", "1024")) * 1024 * 1024
+
+# Linhas por bloco quando a fonte é um DataFrame já pronto
+EXPORT_CHUNK_ROWS = 20_000
+
+MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+# fonte() → iterador de blocos (DataFrames com as mesmas colunas)
+ChunkSource = Callable[[], Iterator[pd.DataFrame]]
+
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+_jobs: dict = {}
+_lock = threading.Lock()
+
+
+def export_key(fingerprint, filter_state, fmt: str) -> str:
+    """Chave do arquivo: dados de origem + estado dos filtros + formato."""
+    raw = json.dumps([fingerprint, filter_state, fmt], default=str, sort_keys=True)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def frame_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> ChunkSource:
+    """Fonte de blocos a partir de um DataFrame em memória."""
+    def source():
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    return source
+
+
+def _path(key: str, fmt: str) -> Path:
+    return EXPORT_DIR / f"{key}.{fmt}"
+
+
+def _cell(value):
+    # openpyxl não aceita NaN/NaT, tipos numpy de data com fuso ou categorias
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.tz_localize(None).to_pydatetime() if value.tzinfo else value.to_pydatetime()
+    if isinstance(value, pd.Timedelta):
+        return str(value)
+    return value
+
+
+def _write_xlsx(chunks: Iterator[pd.DataFrame], path: Path, on_rows) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    header = False
+    for chunk in chunks:
+        if not header:
+            ws.append([str(c) for c in chunk.columns])
+            header = True
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append([_cell(v) for v in row])
+        on_rows(len(chunk))
+    wb.save(path)
+
+
+def _write_csv(chunks: Iterator[pd.DataFrame], path: Path, on_rows) -> None:
+    with open(path, "w", encoding="utf-8-sig", newline="") as fh:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(fh, index=False, header=header)
+            header = False
+            on_rows(len(chunk))
+
+
+WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv}
+
+
+def _run(job: dict, source: ChunkSource) -> None:
+    tmp = job["path"].with_name(job["path"].name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def on_rows(n):
+        job["rows_done"] += n
+
+    try:
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        WRITERS[job["fmt"]](source(), tmp, on_rows)
+        os.replace(tmp, job["path"])
+        job["status"] = "done"
+        evict()
+    except Exception as exc:
+        job["status"] = "error"
+        job["error"] = repr(exc)
+        tmp.unlink(missing_ok=True)
+    finally:
+        job["finished"] = time.time()
+
+
+def _done_job(key: str, fmt: str, path: Path, total_rows: Optional[int] = None) -> Optional[dict]:
+    # job de um arquivo que já está em disco; "finished" é o mtime do arquivo
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    return {"key": key, "fmt": fmt, "path": path, "status": "done", "rows_done": total_rows or 0,
+            "total_rows": total_rows, "error": None, "started": mtime, "finished": mtime}
+
+
+def submit(key: str, fmt: str, source: ChunkSource, total_rows: Optional[int] = None) -> dict:
+    """Inicia (ou reaproveita) a exportação `key`. Devolve o job:
+    {"status": "running" | "done" | "error", "rows_done", "total_rows", "path", "error"}."""
+    path = _path(key, fmt)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and job["status"] != "error" and (job["status"] == "running" or path.exists()):
+            return job
+        try:
+            os.utime(path)   # arquivo de uma execução anterior: conta como usado agora
+            job = _done_job(key, fmt, path, total_rows)
+        except OSError:
+            job = None
+        if job is None:
+            job = {"key": key, "fmt": fmt, "path": path, "status": "running", "rows_done": 0,
+                   "total_rows": total_rows, "error": None, "started": time.time(), "finished": None}
+            _pool.submit(_run, job, source)
+        _jobs[key] = job
+    return job
+
+
+def status(key: str, fmt: str) -> Optional[dict]:
+    """Job da exportação `key`, se já foi pedida (ou o arquivo existe de uma execução
+    anterior). Só consulta: nunca inicia um job."""
+    with _lock:
+        job = _jobs.get(key)
+    if job is None:
+        return _done_job(key, fmt, _path(key, fmt))
+    if job["status"] == "done" and not job["path"].exists():
+        # removido pela limpeza de espaço: precisa ser gerado de novo
+        return None
+    return job
+
+
+def progress(job: dict) -> float:
+    if job["status"] == "done":
+        return 1.0
+    total = job.get("total_rows")
+    return min(job["rows_done"] / total, 1.0) if total else 0.0
+
+
+def evict(max_bytes: Optional[int] = None) -> None:
+    """Remove os arquivos gerados há mais tempo até o diretório caber em `max_bytes`."""
+    max_bytes = EXPORT_MAX_BYTES if max_bytes is None else max_bytes
+    if not EXPORT_DIR.is_dir():
+        return
+    files = []
+    for f in EXPORT_DIR.iterdir():
+        if f.suffix.lstrip(".") in WRITERS:
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+    total = sum(size for _, size, _ in files)
+    for _, size, f in sorted(files):
+        if total <= max_bytes:
+            break
+        f.unlink(missing_ok=True)
+        total -= size
@@ -0,0 +1,450 @@
+"""Leitura das planilhas exportadas do CRM (ControleDiario / pxGetWorkHistory).
+
+Formatos aceitos: XLSX (openpyxl em modo streaming), XLSB (calamine), CSV
+(pyarrow, multi-thread) e XLS legado (pandas).
+
+Módulo sem dependência do Streamlit: é usado pelo app e pode ser reaproveitado
+em scripts.
+"""
+import datetime as dt
+import io
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from openpyxl import load_workbook
+
+import parse_cache
+
+# Linhas lidas por bloco no modo streaming
+CHUNK_ROWS = 10_000
+
+# Mesmos textos que o pd.read_excel trata como nulo por padrão
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+
+# progress(planilha, linhas_lidas, total_estimado_ou_None)
+ProgressFn = Callable[[str, int, Optional[int]], None]
+
+
+# Extensões aceitas nos uploads e na linha de comando
+SUPPORTED_EXTENSIONS = ("xlsx", "xls", "xlsb", "csv")
+
+# Nome da "planilha" única de um arquivo CSV
+CSV_SHEET = "CSV"
+
+# Formatos de data/hora aceitos nos exports CSV (além de ISO 8601)
+CSV_TIMESTAMP_FORMATS = ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y"]
+# Número pt-BR completo ("1.234,56", "-12", "0,5"); outros textos com ponto ficam como texto
+PTBR_NUMBER = r"^-?\d{1,3}(?:\.\d{3})*(?:,\d+)?$|^-?\d+(?:,\d+)?$"
+
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def file_format(file_bytes: bytes) -> str:
+    """"xlsx", "xlsb", "xls" ou "csv", detectado pelo conteúdo do arquivo."""
+    if file_bytes[:8] == _OLE_MAGIC:
+        return "xls"
+    if zipfile.is_zipfile(io.BytesIO(file_bytes)):
+        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+            return "xlsb" if "xl/workbook.bin" in zf.namelist() else "xlsx"
+    return "csv"
+
+
+def _header_names(row: tuple) -> list:
+    """Nomes de coluna no mesmo formato do pandas (Unnamed: i, col.1, ...)."""
+    names, seen = [], {}
+    for i, val in enumerate(row):
+        name = f"Unnamed: {i}" if val is None else val
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _finish_column(chunks: list) -> pd.Series:
+    """Concatena os blocos de uma coluna e fixa o dtype final."""
+    ser = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    chunks.clear()
+    if ser.dtype == object:
+        ser = ser.infer_objects()
+        if ser.isna().all():
+            # coluna totalmente vazia vira float64, como no pd.read_excel
+            return ser.astype("float64")
+    if ser.dtype == object or pd.api.types.is_string_dtype(ser.dtype):
+        na_mask = ser.isin(NA_STRINGS)
+        if na_mask.any():
+            ser = ser.mask(na_mask).infer_objects()
+    if ser.dtype.kind == "f" and len(ser) and ser.notna().all():
+        # o leitor do pandas devolve inteiros para células numéricas inteiras
+        if np.array_equal(ser.to_numpy(), np.floor(ser.to_numpy())):
+            ser = ser.astype("int64")
+    return ser
+
+
+def _frame_from_rows(rows, title: str, total: Optional[int],
+                     progress: Optional[ProgressFn], chunk_rows: int) -> pd.DataFrame:
+    """Monta o DataFrame a partir de um iterador de linhas (a primeira é o cabeçalho),
+    bloco a bloco, com os mesmos tipos que o pd.read_excel produziria."""
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    while header and header[-1] is None:
+        header = header[:-1]
+    names = _header_names(header)
+
+    col_chunks: list = [[] for _ in names]
+    buf: list = []
+    pending_blank: list = []
+    n_rows = 0
+
+    def flush():
+        nonlocal n_rows
+        if not buf:
+            return
+        width = max(len(r) for r in buf)
+        while len(names) < width:
+            # linha mais larga que o cabeçalho → coluna extra "Unnamed: i"
+            names.append(f"Unnamed: {len(names)}")
+            col_chunks.append([pd.Series([None] * n_rows, dtype=object)] if n_rows else [])
+        for j in range(len(names)):
+            vals = [r[j] if j < len(r) else None for r in buf]
+            col_chunks[j].append(pd.Series(vals))
+        n_rows += len(buf)
+        buf.clear()
+        if progress:
+            progress(title, n_rows, total)
+
+    for row in rows:
+        if all(v is None for v in row):
+            # linhas vazias só entram se houver dados depois delas
+            pending_blank.append(row)
+            continue
+        if pending_blank:
+            buf.extend(pending_blank)
+            pending_blank.clear()
+        buf.append(row)
+        if len(buf) >= chunk_rows:
+            flush()
+    flush()
+
+    data = {}
+    for name, chunks in zip(names, col_chunks):
+        data[name] = _finish_column(chunks) if chunks else pd.Series([], dtype=object)
+    return pd.DataFrame(data)
+
+
+def _read_rows(ws, title: str, progress: Optional[ProgressFn], chunk_rows: int) -> pd.DataFrame:
+    # total vem da tag <dimension>; pode faltar ou estar errado em alguns exports
+    total = ws.max_row - 1 if ws.max_row else None
+    ws.reset_dimensions()
+    return _frame_from_rows(ws.iter_rows(values_only=True), title, total, progress, chunk_rows)
+
+
+# ── XLSB (leitor nativo calamine) ────────────────────────────────────────────
+def _calamine_workbook(file_bytes: bytes):
+    from python_calamine import CalamineWorkbook
+    return CalamineWorkbook.from_filelike(io.BytesIO(file_bytes))
+
+
+def _xlsb_cell(v):
+    # calamine devolve "" para células vazias e date (não datetime) quando a hora
+    # é meia-noite; sem isso a coluna de datas ficaria mista (object)
+    if v == "":
+        return None
+    if type(v) is dt.date:
+        return dt.datetime(v.year, v.month, v.day)
+    return v
+
+
+def _read_xlsb_sheet(wb, sheet: str, progress: Optional[ProgressFn], chunk_rows: int) -> pd.DataFrame:
+    ws = wb.get_sheet_by_name(sheet)
+    rows = (tuple(_xlsb_cell(v) for v in row) for row in ws.iter_rows())
+    total = ws.height - 1 if ws.height else None
+    return _frame_from_rows(rows, sheet, total, progress, chunk_rows)
+
+
+# ── CSV (leitor colunar multi-thread do pyarrow) ─────────────────────────────
+def _sniff_csv(file_bytes: bytes) -> tuple:
+    """(encoding, delimitador) a partir do início do arquivo."""
+    head = file_bytes[:65536]
+    try:
+        head.decode("utf-8")
+        encoding = "utf8"
+    except UnicodeDecodeError as exc:
+        # o bloco pode ter cortado um caractere multibyte no fim
+        encoding = "utf8" if exc.start >= len(head) - 3 else "cp1252"
+    first_line = head.split(b"\n", 1)[0]
+    delimiter = max([";", ",", "\t", "|"], key=lambda d: first_line.count(d.encode()))
+    return encoding, delimiter
+
+
+def _read_csv(file_bytes: bytes, progress: Optional[ProgressFn] = None) -> pd.DataFrame:
+    encoding, delimiter = _sniff_csv(file_bytes)
+    # exports em pt-BR separados por ";" usam vírgula decimal
+    decimal = "," if delimiter == ";" else "."
+    table = pa_csv.read_csv(
+        pa.BufferReader(file_bytes),
+        read_options=pa_csv.ReadOptions(use_threads=True, encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            null_values=sorted(NA_STRINGS),
+            strings_can_be_null=True,
+            decimal_point=decimal,
+            timestamp_parsers=CSV_TIMESTAMP_FORMATS + [pa_csv.ISO8601],
+        ),
+    )
+    df = table.to_pandas(coerce_temporal_nanoseconds=True)
+    del table
+    df.columns = _header_names([c if c != "" else None for c in df.columns])
+    if decimal == ",":
+        for col in df.columns:
+            ser = df[col]
+            if ser.dtype == object or pd.api.types.is_string_dtype(ser.dtype):
+                # "1.234,56" → 1234.56 (pyarrow não trata separador de milhar); só
+                # converte se todos os valores forem números pt-BR ("01.02.2024" não é)
+                filled = ser.dropna().astype(str).str.strip()
+                if filled.empty or not filled.str.fullmatch(PTBR_NUMBER).all():
+                    continue
+                df[col] = pd.to_numeric(
+                    ser.str.strip().str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+                    errors="coerce",
+                )
+    for col in df.columns:
+        if df[col].dtype.kind == "f":
+            df[col] = _finish_column([df[col]])
+    if progress:
+        progress(CSV_SHEET, len(df), len(df))
+    return df
+
+
+def _count_csv_rows(file_bytes: bytes) -> int:
+    n = file_bytes.count(b"\n")
+    if file_bytes and not file_bytes.endswith(b"\n"):
+        n += 1
+    return max(n - 1, 0)
+
+
+def sheet_names(file_bytes: bytes) -> list:
+    fmt = file_format(file_bytes)
+    if fmt == "csv":
+        return [CSV_SHEET]
+    if fmt == "xlsb":
+        return list(_calamine_workbook(file_bytes).sheet_names)
+    if fmt == "xls":
+        return pd.ExcelFile(io.BytesIO(file_bytes)).sheet_names
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def sheet_catalogue(file_bytes: bytes) -> list:
+    """Planilhas do arquivo com nº de linhas de dados e de colunas, sem ler os dados.
+
+    Usa a tag <dimension> de cada planilha; só quando ela falta as linhas são
+    contadas percorrendo o XML (ainda sem montar DataFrames). Em CSV as linhas
+    são contadas pelas quebras de linha; em XLSB vêm do range de cada planilha
+    e em XLS do `nrows` do xlrd, carregando uma planilha por vez.
+    """
+    fmt = file_format(file_bytes)
+    if fmt == "csv":
+        _, delimiter = _sniff_csv(file_bytes)
+        first_line = file_bytes.split(b"\n", 1)[0]
+        return [{"name": CSV_SHEET, "rows": _count_csv_rows(file_bytes),
+                 "cols": first_line.count(delimiter.encode()) + 1}]
+    if fmt == "xlsb":
+        wb = _calamine_workbook(file_bytes)
+        catalogue = []
+        for name in wb.sheet_names:
+            ws = wb.get_sheet_by_name(name)
+            catalogue.append({"name": name, "rows": max(ws.height - 1, 0), "cols": ws.width})
+        return catalogue
+    if fmt == "xls":
+        import xlrd   # o mesmo leitor que o pandas usa para .xls
+        book = xlrd.open_workbook(file_contents=file_bytes, on_demand=True)
+        try:
+            catalogue = []
+            for i, name in enumerate(book.sheet_names()):
+                ws = book.sheet_by_index(i)
+                catalogue.append({"name": name, "rows": max(ws.nrows - 1, 0), "cols": ws.ncols})
+                book.unload_sheet(i)
+            return catalogue
+        finally:
+            book.release_resources()
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        catalogue = []
+        for ws in wb.worksheets:
+            n_rows, n_cols = ws.max_row, ws.max_column
+            if n_rows is None or n_cols is None:
+                ws.reset_dimensions()
+                n_rows, n_cols = 0, 0
+                for row in ws.iter_rows(values_only=True):
+                    n_rows += 1
+                    n_cols = max(n_cols, len(row))
+            catalogue.append({"name": ws.title, "rows": max(n_rows - 1, 0), "cols": n_cols})
+        return catalogue
+    finally:
+        wb.close()
+
+
+def read_sheet(
+    file_bytes: bytes,
+    sheet_name: Optional[str] = None,
+    progress: Optional[ProgressFn] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Lê uma planilha (a primeira, se `sheet_name` for None) em blocos de linhas."""
+    fmt = file_format(file_bytes)
+    if fmt == "csv":
+        return _read_csv(file_bytes, progress)
+    if fmt == "xlsb":
+        wb = _calamine_workbook(file_bytes)
+        return _read_xlsb_sheet(wb, sheet_name or wb.sheet_names[0], progress, chunk_rows)
+    if fmt == "xls":
+        return pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_name or 0)
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+        return _read_rows(ws, ws.title, progress, chunk_rows)
+    finally:
+        wb.close()
+
+
+def read_workbook(
+    file_bytes: bytes,
+    progress: Optional[ProgressFn] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> dict:
+    """Lê todas as planilhas do arquivo → {nome: DataFrame}."""
+    fmt = file_format(file_bytes)
+    if fmt in ("csv", "xlsb"):
+        return {sheet: read_sheet(file_bytes, sheet, progress, chunk_rows) for sheet in sheet_names(file_bytes)}
+    if fmt == "xls":
+        xl = pd.ExcelFile(io.BytesIO(file_bytes))
+        return {sheet: xl.parse(sheet) for sheet in xl.sheet_names}
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        return {ws.title: _read_rows(ws, ws.title, progress, chunk_rows) for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+
+# Abaixo deste tamanho (soma dos arquivos) subir processos custa mais que ler em sequência
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+
+def read_keyed_sheet(
+    file_bytes: bytes,
+    key_col: str,
+    cache_key: Optional[str] = None,
+    progress: Optional[ProgressFn] = None,
+) -> pd.DataFrame:
+    """Primeira planilha do arquivo com a coluna-chave normalizada (texto, sem espaços).
+
+    Com `cache_key`, passa pelo cache em disco (ver parse_cache).
+    """
+    sheet = sheet_names(file_bytes)[0]
+    df = parse_cache.load_sheet(cache_key, sheet) if cache_key else None
+    if df is None:
+        df = read_sheet(file_bytes, sheet, progress=progress)
+        if cache_key:
+            parse_cache.save_sheets(cache_key, {sheet: df}, complete=False)
+    df[key_col] = df[key_col].astype(str).str.strip()
+    return df
+
+
+def read_keyed_sheets(jobs: list, progress: Optional[ProgressFn] = None) -> list:
+    """Lê vários arquivos `(file_bytes, key_col, cache_key)` → lista de DataFrames.
+
+    Cada arquivo é lido em um processo separado (as leituras são independentes
+    e limitadas por CPU); arquivos pequenos, ou ambientes onde não é possível
+    criar processos, caem na leitura sequencial com progresso por linhas.
+    """
+    if len(jobs) > 1 and sum(len(b) for b, _, _ in jobs) >= PARALLEL_MIN_BYTES:
+        # spawn: o processo do Streamlit tem threads, fork não é seguro
+        ctx = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(max_workers=len(jobs), mp_context=ctx) as pool:
+                futures = [pool.submit(read_keyed_sheet, *job) for job in jobs]
+                return [f.result() for f in futures]
+        except (BrokenProcessPool, OSError):
+            pass
+    return [read_keyed_sheet(*job, progress=progress) for job in jobs]
+
+
+# Texto com até esta fração de valores distintos vira category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _is_text(ser: pd.Series) -> bool:
+    return ser.dtype == object or (
+        pd.api.types.is_string_dtype(ser.dtype) and not isinstance(ser.dtype, pd.CategoricalDtype)
+    )
+
+
+def _looks_like_date_col(name) -> bool:
+    n = str(name).lower()
+    return "data" in n or "hora" in n or "date" in n
+
+
+def optimize_dtypes(df: pd.DataFrame, exclude=()) -> tuple:
+    """Normaliza os tipos depois da leitura → (df, relatório de memória).
+
+    - texto de baixa cardinalidade → category
+    - inteiros → menor tipo inteiro que comporta os valores
+    - floats → float32 apenas quando a conversão não perde nenhum valor
+      (valores monetários com centavos costumam continuar float64)
+    - colunas de data/hora lidas como texto → datetime, uma única vez
+
+    Colunas em `exclude` (chaves de vínculo) não são alteradas.
+    """
+    before = df.memory_usage(deep=True, index=False)
+    out = {}
+    for col in df.columns:
+        ser = df[col]
+        if col in exclude:
+            out[col] = ser
+            continue
+        if _is_text(ser):
+            non_null = ser.notna().sum()
+            if non_null and _looks_like_date_col(col):
+                parsed = pd.to_datetime(ser, errors="coerce", dayfirst=True)
+                if parsed.notna().sum() == non_null:
+                    out[col] = parsed
+                    continue
+            n_uniq = ser.nunique(dropna=True)
+            if len(ser) > 1 and n_uniq <= len(ser) * CATEGORY_MAX_RATIO:
+                ser = ser.astype("category")
+        elif pd.api.types.is_integer_dtype(ser.dtype) and not pd.api.types.is_bool_dtype(ser.dtype):
+            ser = pd.to_numeric(ser, downcast="integer")
+        elif ser.dtype == np.float64:
+            as32 = ser.astype(np.float32)
+            if np.array_equal(as32.to_numpy(np.float64), ser.to_numpy(), equal_nan=True):
+                ser = as32
+        out[col] = ser
+    optimized = pd.DataFrame(out, index=df.index)
+    after = optimized.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        "Coluna": list(df.columns),
+        "Tipo original": [str(t) for t in df.dtypes],
+        "Tipo otimizado": [str(t) for t in optimized.dtypes],
+        "Memória antes (KB)": (before.to_numpy() / 1024).round(1),
+        "Memória depois (KB)": (after.to_numpy() / 1024).round(1),
+    })
+    return optimized, report
@@ -0,0 +1,180 @@
+"""Cache em disco das planilhas já lidas, endereçado pelo conteúdo do arquivo.
+
+Cada upload vira um diretório `<hash>/` com um arquivo Arrow IPC (Feather v2,
+sem compressão, para poder ser lido via memory-map) por planilha. Um reinício
+do servidor ou um segundo analista abrindo o mesmo export lê daqui em vez de
+passar de novo pelo openpyxl.
+
+O diretório é limitado por tamanho: ao gravar, as entradas usadas há mais
+tempo (mtime do manifesto, atualizado a cada leitura) são removidas até caber.
+A versão dos leitores (PARSER_VERSION) faz parte da chave: ao mudar os tipos
+que eles devolvem, as entradas antigas deixam de ser lidas e saem pela mesma
+limpeza.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+CACHE_DIR = Path(os.environ.get("CAMBIOBIX_CACHE_DIR", Path.home() / ".cache" / "cambiobix"))
+CACHE_MAX_BYTES = int(os.environ.get("CAMBIOBIX_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+MANIFEST = "manifest.json"
+
+# Suba sempre que os leitores (loaders) passarem a devolver outros valores/tipos.
+# 2: números pt-BR estritos no CSV; datas de meia-noite do calamine como datetime
+PARSER_VERSION = 2
+
+
+def content_hash(file_bytes: bytes) -> str:
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+def _sheet_file(sheet: str) -> str:
+    return hashlib.blake2b(sheet.encode("utf-8"), digest_size=8).hexdigest() + ".arrow"
+
+
+def _entry_dir(key: str) -> Path:
+    return CACHE_DIR / f"{key}.v{PARSER_VERSION}"
+
+
+def _tmp_file(entry: Path, name: str) -> Path:
+    fd, path = tempfile.mkstemp(prefix=f".{name}-", suffix=".tmp", dir=entry)
+    os.close(fd)
+    return Path(path)
+
+
+def _read_manifest(entry: Path) -> Optional[dict]:
+    try:
+        with open(entry / MANIFEST, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _touch(entry: Path) -> None:
+    try:
+        os.utime(entry / MANIFEST)
+    except OSError:
+        pass
+
+
+def _cacheable(df: pd.DataFrame) -> bool:
+    # Arrow só guarda nomes de coluna texto; nomes numéricos voltariam como str
+    return all(isinstance(c, str) for c in df.columns) and df.columns.is_unique
+
+
+def load_sheet(key: str, sheet: str) -> Optional[pd.DataFrame]:
+    entry = _entry_dir(key)
+    manifest = _read_manifest(entry)
+    if manifest is None or sheet not in manifest.get("sheets", {}):
+        return None
+    try:
+        df = feather.read_feather(entry / manifest["sheets"][sheet], memory_map=True)
+    except (OSError, pa.ArrowException):
+        return None
+    _touch(entry)
+    return df
+
+
+def load_workbook(key: str) -> Optional[dict]:
+    """Todas as planilhas do arquivo, ou None se alguma não estiver no cache."""
+    manifest = _read_manifest(_entry_dir(key))
+    if manifest is None or not manifest.get("complete"):
+        return None
+    sheets = {}
+    for sheet in manifest["order"]:
+        df = load_sheet(key, sheet)
+        if df is None:
+            return None
+        sheets[sheet] = df
+    return sheets
+
+
+def save_sheets(key: str, sheets: dict, complete: bool = True) -> None:
+    """Grava as planilhas de um arquivo. `complete=False` marca uma entrada
+    parcial (só algumas planilhas), que não serve para `load_workbook`.
+
+    Só as planilhas que ainda não estão na entrada são gravadas. Cada arquivo, e
+    por último o manifesto, entra por os.replace: quem lê ao mesmo tempo vê a
+    entrada de antes ou a de depois, nunca uma pela metade.
+    """
+    if not all(_cacheable(df) for df in sheets.values()):
+        return
+    entry = _entry_dir(key)
+    entry.mkdir(parents=True, exist_ok=True)
+    cached = (_read_manifest(entry) or {}).get("sheets", {})
+    tmp_files, new_files = [], []
+    try:
+        for sheet, df in sheets.items():
+            name = _sheet_file(sheet)
+            if cached.get(sheet) == name and (entry / name).exists():
+                continue
+            tmp = _tmp_file(entry, name)
+            tmp_files.append(tmp)
+            try:
+                feather.write_feather(df, tmp, compression="uncompressed")
+            except (pa.ArrowException, ValueError, TypeError):
+                # colunas com tipos misturados não têm representação em Arrow
+                return
+            new_files.append((tmp, entry / name))
+        for tmp, path in new_files:
+            os.replace(tmp, path)
+
+        # relido agora: outra sessão pode ter incluído planilhas nesse meio-tempo
+        manifest = _read_manifest(entry) or {"sheets": {}, "order": [], "complete": False}
+        for sheet in sheets:
+            manifest["sheets"][sheet] = _sheet_file(sheet)
+            if sheet not in manifest["order"]:
+                manifest["order"].append(sheet)
+        if complete:
+            manifest["order"] = list(sheets)
+            manifest["complete"] = True
+        manifest["parser_version"] = PARSER_VERSION
+        manifest["saved_at"] = time.time()
+        tmp = _tmp_file(entry, MANIFEST)
+        tmp_files.append(tmp)
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, ensure_ascii=False)
+        os.replace(tmp, entry / MANIFEST)
+    finally:
+        for tmp in tmp_files:
+            tmp.unlink(missing_ok=True)
+        try:
+            entry.rmdir()   # só some se ficou vazia (nada chegou a ser gravado)
+        except OSError:
+            pass
+    evict()
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def evict(max_bytes: Optional[int] = None) -> None:
+    """Remove as entradas menos usadas até o cache caber em `max_bytes`."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIR.is_dir():
+        return
+    entries = []
+    for entry in CACHE_DIR.iterdir():
+        if entry.name.startswith(".") or not entry.is_dir():
+            continue
+        try:
+            entries.append(((entry / MANIFEST).stat().st_mtime, _entry_size(entry), entry))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
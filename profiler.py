@@ -0,0 +1,93 @@
+"""Perfil das colunas de um DataFrame para os diagnósticos de qualidade.
+
+Uma passada por coluna calcula nulos, valores distintos, tipo, mínimo/máximo e
+os valores mais frequentes. Colunas categóricas são contadas pelos códigos;
+colunas grandes de alta cardinalidade usam uma estimativa HyperLogLog dos
+distintos (erro típico ≈ 1,04/√2^HLL_PRECISION, ~0,8%) e tiram os mais
+frequentes de uma amostra, em vez de montar a tabela de contagem completa.
+"""
+import numpy as np
+import pandas as pd
+
+# Acima disto (linhas não nulas), colunas de texto/número usam a estimativa
+PROFILE_EXACT_ROWS = 200_000
+PROFILE_SAMPLE_ROWS = 100_000
+PROFILE_TOP_N = 5
+HLL_PRECISION = 14
+
+PROFILE_COLUMNS = ["Coluna", "Tipo", "Nulos", "% Nulos", "Preenchidos", "Únicos",
+                   "Únicos aprox.", "Mínimo", "Máximo", "Mais frequentes"]
+
+
+def _bit_length32(x: np.ndarray) -> np.ndarray:
+    # frexp é exato para inteiros de até 32 bits; 0 → 0
+    return np.frexp(x.astype(np.float64))[1].astype(np.int64)
+
+
+def hll_distinct(values, precision: int = HLL_PRECISION) -> int:
+    """Estimativa HyperLogLog do nº de valores distintos (não nulos) de `values`."""
+    hashes = pd.util.hash_pandas_object(pd.Series(values), index=False, categorize=False).to_numpy()
+    m = 1 << precision
+    idx = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes << np.uint64(precision)
+    hi = rest >> np.uint64(32)
+    lo = rest & np.uint64(0xFFFFFFFF)
+    # posição do primeiro bit 1 (1 = bit mais alto); resto todo zero → 64 - p + 1
+    bits = np.where(hi > 0, _bit_length32(hi) + 32, _bit_length32(lo))
+    rho = np.minimum(65 - bits, 64 - precision + 1).astype(np.uint8)
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, idx, rho)
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int((registers == 0).sum())
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)   # correção para cardinalidades pequenas
+    return int(round(estimate))
+
+
+def _top_values(counts: pd.Series, top_n: int) -> str:
+    return ", ".join(f"{v} ({n:,})" for v, n in counts.head(top_n).items())
+
+
+def _profile_column(name, s: pd.Series, total_rows: int, top_n: int) -> dict:
+    n_null = int(s.isna().sum())
+    filled = total_rows - n_null
+    dtype = s.dtype
+    row = {"Coluna": name, "Tipo": str(dtype), "Nulos": n_null,
+           "% Nulos": round(n_null / total_rows * 100, 2) if total_rows else 0.0,
+           "Preenchidos": filled, "Únicos": 0, "Únicos aprox.": False,
+           "Mínimo": "", "Máximo": "", "Mais frequentes": ""}
+    if not filled:
+        return row
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(dtype.categories))
+        counts = pd.Series(counts, index=dtype.categories).loc[lambda c: c > 0].sort_values(ascending=False, kind="stable")
+        row["Únicos"] = int(counts.size)
+        row["Mais frequentes"] = _top_values(counts, top_n)
+    elif filled > PROFILE_EXACT_ROWS and not pd.api.types.is_bool_dtype(dtype):
+        values = s.dropna()
+        row["Únicos"] = hll_distinct(values)
+        row["Únicos aprox."] = True
+        sample = values.sample(PROFILE_SAMPLE_ROWS, random_state=0) if filled > PROFILE_SAMPLE_ROWS else values
+        counts = sample.value_counts()
+        row["Mais frequentes"] = _top_values((counts * (filled / len(sample))).round().astype(int), top_n)
+    else:
+        counts = s.value_counts(dropna=True)
+        row["Únicos"] = int(counts.size)
+        row["Mais frequentes"] = _top_values(counts, top_n)
+
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) \
+            or pd.api.types.is_datetime64_any_dtype(dtype):
+        # texto já aqui: no DataFrame final inteiros e floats virariam todos float
+        row["Mínimo"], row["Máximo"] = str(s.min()), str(s.max())
+    return row
+
+
+def profile_columns(df: pd.DataFrame, top_n: int = PROFILE_TOP_N) -> pd.DataFrame:
+    """Uma linha por coluna de `df`, na ordem das colunas (ver PROFILE_COLUMNS)."""
+    total_rows = len(df)
+    rows = [_profile_column(c, df[c], total_rows, top_n) for c in df.columns]
+    return pd.DataFrame(rows, columns=PROFILE_COLUMNS)
@@ -0,0 +1,225 @@
+"""Índice de busca textual das operações (caixa "Buscar ID / Razão Social").
+
+O texto das colunas pesquisáveis é normalizado (minúsculas, sem acentos) e
+concatenado por linha, e um índice invertido de trigramas aponta, para cada
+trigrama, as linhas em que ele aparece. Uma busca intersecta as listas dos
+trigramas do termo (da mais curta para a mais longa) e só confirma a
+substring nas linhas candidatas.
+"""
+import numpy as np
+import pandas as pd
+
+# Separa as colunas no texto concatenado; nunca aparece num termo de busca
+_SEP = "\x1f"
+_GRAM = 3
+
+
+def fold(text: pd.Series) -> pd.Series:
+    """Minúsculas e sem acentos ("São José" → "sao jose"); nulos viram ""."""
+    return (
+        text.astype(str).mask(text.isna(), "")
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.lower()
+    )
+
+
+def fold_term(term: str) -> str:
+    return fold(pd.Series([term])).iloc[0].strip()
+
+
+def _trigram_index(texts: np.ndarray) -> dict:
+    """Índice invertido trigrama → posições (crescentes) dos textos que o contêm."""
+    # Todos os textos num só buffer de bytes; cada posição gera o trigrama que começa nela
+    lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+    buf = np.frombuffer((_SEP.join(texts) + _SEP).encode("ascii"), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    if len(buf) >= _GRAM:
+        b = buf.astype(np.int64)
+        codes = (b[:-2] << 16) | (b[1:-1] << 8) | b[2:]
+        sep = ord(_SEP)
+        ok = (buf[:-2] != sep) & (buf[1:-1] != sep) & (buf[2:] != sep)
+        # (trigrama, linha) únicos e ordenados: listas de linhas contíguas por trigrama
+        pairs = np.sort((codes[ok] << 32) | rows[:-2][ok])
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+        gram_of_pair = pairs >> 32
+        starts = np.flatnonzero(np.append(True, gram_of_pair[1:] != gram_of_pair[:-1]))
+        grams = gram_of_pair[starts]
+        row_ids = (pairs & 0xFFFFFFFF).astype(np.int32)
+    else:
+        grams = starts = np.array([], dtype=np.int64)
+        row_ids = np.array([], dtype=np.int32)
+    offsets = np.append(starts, len(row_ids)).astype(np.int64)
+    return {"text": texts, "grams": grams, "offsets": offsets, "rows": row_ids}
+
+
+def _grams_of(text: str) -> set:
+    b = text.encode("ascii")
+    return {(b[i] << 16) | (b[i + 1] << 8) | b[i + 2] for i in range(len(b) - _GRAM + 1)}
+
+
+def build_search_index(df: pd.DataFrame, cols) -> dict:
+    """Texto normalizado por linha + índice invertido trigrama → linhas (posições em df)."""
+    cols = [c for c in cols if c in df.columns]
+    if cols:
+        text = fold(df[cols[0]])
+        for c in cols[1:]:
+            text = text + _SEP + fold(df[c])
+    else:
+        text = pd.Series("", index=df.index)
+    return _trigram_index(text.to_numpy(dtype=object))
+
+
+def _gram_rows(index: dict, code: int) -> np.ndarray:
+    i = np.searchsorted(index["grams"], code)
+    if i == len(index["grams"]) or index["grams"][i] != code:
+        return np.array([], dtype=np.int32)
+    return index["rows"][index["offsets"][i]:index["offsets"][i + 1]]
+
+
+def search(index: dict, term: str) -> np.ndarray:
+    """Posições (crescentes) das linhas cujo texto contém `term`, sem diferenciar
+    maiúsculas nem acentos. Termo em branco devolve todas as linhas; termo que
+    some ao normalizar (ex.: só emoji ou acento solto) não encontra nada."""
+    q = fold_term(term)
+    texts = index["text"]
+    if not q:
+        return np.arange(len(texts)) if not term.strip() else np.empty(0, dtype=np.int64)
+    if len(q) < _GRAM or not q.isascii():
+        # termo curto demais para o índice: varre só o texto já normalizado
+        return np.flatnonzero([q in t for t in texts])
+
+    lists = sorted((_gram_rows(index, c) for c in _grams_of(q)), key=len)
+    cand = lists[0]
+    for lst in lists[1:]:
+        if not len(cand):
+            break
+        cand = np.intersect1d(cand, lst, assume_unique=True)
+    if len(q) == _GRAM:
+        return cand.astype(np.int64)
+    return np.array([r for r in cand if q in texts[r]], dtype=np.int64)
+
+
+# ── Sugestões de vínculo para chaves do histórico sem operação ───────────────
+# Trigramas presentes em mais que esta fração das chaves (ex.: "cbo", "ops")
+# não servem de bloco; o piso evita descartar tudo em bases pequenas
+MATCH_MAX_GRAM_RATIO = 0.01
+MATCH_MIN_BLOCK = 200
+# Candidatos (mais trigramas raros em comum) que recebem a pontuação completa
+MATCH_CANDIDATES = 20
+MATCH_TOP_K = 3
+MATCH_MIN_SCORE = 0.75
+
+MATCH_COLUMNS = ["Chave do Caso (no Histórico)", "Chave sugerida (Operações)", "Operação",
+                 "Similaridade", "Critério"]
+
+
+def normalize_key(keys: pd.Series) -> pd.Series:
+    """Chave comparável: minúsculas, sem acentos, só letras e dígitos."""
+    return fold(keys).str.replace(r"[^0-9a-z]+", "", regex=True)
+
+
+def suggest_matches(unmatched: pd.Series, op_keys: pd.Series, op_labels: pd.Series = None,
+                    top_k: int = MATCH_TOP_K, min_score: float = MATCH_MIN_SCORE) -> pd.DataFrame:
+    """Operações prováveis para cada chave do histórico sem operação.
+
+    Chaves iguais depois de normalizadas (espaços, caixa, pontuação) valem 1.0.
+    As demais são comparadas só com as operações que compartilham trigramas
+    pouco frequentes (blocagem pelo índice invertido), e a similaridade é o
+    coeficiente de Dice entre os conjuntos de trigramas das chaves normalizadas.
+    """
+    op_keys = op_keys.reset_index(drop=True)
+    op_labels = op_keys if op_labels is None else op_labels.reset_index(drop=True)
+    op_norm = normalize_key(op_keys).to_numpy(dtype=object)
+    index = _trigram_index(op_norm)
+    by_norm = pd.Series(np.arange(len(op_norm))).groupby(op_norm).indices
+
+    sizes = np.diff(index["offsets"])
+    cap = max(MATCH_MIN_BLOCK, int(len(op_norm) * MATCH_MAX_GRAM_RATIO))
+    op_grams: dict = {}
+
+    keys = pd.Series(pd.unique(unmatched.dropna()))
+    out = []
+    for key, q in zip(keys, normalize_key(keys)):
+        exact = by_norm.get(q)
+        if exact is not None:
+            out += [(key, op_keys[i], op_labels[i], 1.0, "Chave normalizada idêntica") for i in exact[:top_k]]
+            continue
+        q_grams = _grams_of(q)
+        if not q_grams:
+            continue
+        codes = np.fromiter(q_grams, dtype=np.int64)
+        pos = np.searchsorted(index["grams"], codes)
+        pos = pos[(pos < len(index["grams"])) & (index["grams"][np.minimum(pos, len(index["grams"]) - 1)] == codes)]
+        if not len(pos):
+            continue
+        block = pos[sizes[pos] <= cap]
+        if not len(block):
+            block = pos[np.argsort(sizes[pos])[:2]]
+        cand = np.concatenate([index["rows"][index["offsets"][i]:index["offsets"][i + 1]] for i in block])
+        cand, hits = np.unique(cand, return_counts=True)
+        if len(cand) > MATCH_CANDIDATES:
+            cand = cand[np.argpartition(-hits, MATCH_CANDIDATES)[:MATCH_CANDIDATES]]
+
+        scored = []
+        for c in cand:
+            g = op_grams.get(c)
+            if g is None:
+                g = op_grams[c] = _grams_of(op_norm[c])
+            score = 2 * len(q_grams & g) / (len(q_grams) + len(g))
+            if score >= min_score:
+                scored.append((score, c))
+        for score, c in sorted(scored, key=lambda t: (-t[0], t[1]))[:top_k]:
+            out.append((key, op_keys[c], op_labels[c], round(score, 3), "Trigramas em comum"))
+    return pd.DataFrame(out, columns=MATCH_COLUMNS)
+
+
+# ── Seletor de operações: busca por prefixo das palavras da chave ────────────
+PICKER_LIMIT = 200
+
+
+def build_key_index(keys) -> dict:
+    """Chaves distintas (com o tipo original, em ordem alfabética do texto) e um
+    índice ordenado (palavra normalizada → chave) para buscas por prefixo.
+    Indexa as palavras e os trechos entre hífens: "p-283" e "ops" encontram
+    "CB-OPS-WORK P-28304"."""
+    uniq = pd.unique(pd.Series(keys).dropna())
+    labels = uniq.astype(str)
+    alpha = np.argsort(labels, kind="stable")
+    tokens = fold(pd.Series(labels[alpha], dtype=object)).str.split().explode().dropna()
+    parts = tokens.str.split("-").explode()
+    words = pd.concat([tokens, parts[parts.str.len() > 0]])
+    words = words[~pd.MultiIndex.from_arrays([words.index, words]).duplicated()]
+    order = np.argsort(words.to_numpy(dtype=str), kind="stable")
+    return {
+        "keys": np.asarray(uniq, dtype=object)[alpha],
+        "words": words.to_numpy(dtype=str)[order],
+        "owner": words.index.to_numpy(dtype=np.int64)[order],
+    }
+
+
+def prefix_search(index: dict, prefix: str, limit: int = PICKER_LIMIT, score: np.ndarray = None) -> tuple:
+    """Chaves com alguma palavra começando por `prefix` → (posições em index["keys"], nº total).
+
+    Devolve no máximo `limit` posições: as de maior `score` (alinhado a
+    index["keys"]), ou em ordem alfabética da chave sem `score`.
+    """
+    terms = fold_term(prefix).split()
+    if terms:
+        hits = None
+        for term in terms:
+            lo = np.searchsorted(index["words"], term, side="left")
+            hi = np.searchsorted(index["words"], term + "\U0010ffff", side="left")
+            owners = np.unique(index["owner"][lo:hi])
+            hits = owners if hits is None else np.intersect1d(hits, owners, assume_unique=True)
+    else:
+        hits = np.arange(len(index["keys"]))
+    total = len(hits)
+    if score is not None:
+        s = np.nan_to_num(np.asarray(score, dtype=np.float64)[hits], nan=-np.inf)
+        if total > limit:
+            keep = np.argpartition(-s, limit - 1)[:limit]
+            hits, s = hits[keep], s[keep]
+        hits = hits[np.lexsort((hits, -s))]
+    else:
+        hits = hits[:limit]   # posições crescentes = ordem alfabética das chaves
+    return hits, total
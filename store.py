@@ -0,0 +1,270 @@
+"""Base local consolidada dos exports diários do ControleDiario.
+
+Cada export ingerido vira um segmento Arrow imutável (`segments/NNNNNN.arrow`).
+O estado por caso — status atual e em qual segmento/linha está a versão mais
+recente — fica em `state.arrow`, só com colunas pequenas; as mudanças de
+"Status de caso" de cada ingestão vão para `changes/NNNNNN.arrow`.
+
+Ingerir um export custa a leitura do arquivo novo mais a atualização do estado
+(uma linha por caso), sem reler os exports anteriores. A tabela consolidada
+(`current.arrow`) é montada a partir dos segmentos na primeira abertura depois
+de uma ingestão e, dali em diante, lida via memory-map.
+
+Uso pela linha de comando:
+    python store.py ingest exports/ControleDiario_*.xlsx exports/ControleDiario_*.csv
+    python store.py info
+"""
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+import parse_cache
+from analytics import COL_CHAVE_CD
+from loaders import SUPPORTED_EXTENSIONS, ProgressFn, read_sheet, sheet_catalogue
+
+STORE_DIR = Path(os.environ.get("CAMBIOBIX_STORE_DIR", Path.home() / ".local" / "share" / "cambiobix" / "store"))
+
+COL_STATUS = "Status de caso"
+CHANGE_COLUMNS = ["Chave", "Status anterior", "Status novo", "Export", "Ingerido em"]
+
+LOCK_TIMEOUT_S = 60
+
+
+class StoreError(Exception):
+    pass
+
+
+def _paths(root: Path) -> dict:
+    return {
+        "manifest": root / "manifest.json",
+        "state": root / "state.arrow",
+        "current": root / "current.arrow",
+        "segments": root / "segments",
+        "changes": root / "changes",
+        "lock": root / ".lock",
+    }
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def _locked(root: Path):
+    """Trava exclusiva da base (sessões do Streamlit e a CLI podem ingerir juntas).
+
+    A trava é do sistema operacional sobre o descritor aberto: é liberada ao
+    fechar o arquivo ou quando o processo morre, então uma ingestão
+    interrompida não deixa a base travada. O arquivo `.lock` fica no disco.
+    """
+    lock = _paths(root)["lock"]
+    fd = os.open(lock, os.O_CREAT | os.O_RDWR)
+    try:
+        deadline = time.time() + LOCK_TIMEOUT_S
+        while not _try_lock(fd):
+            if time.time() > deadline:
+                raise StoreError(f"Base travada por outra ingestão ({lock})")
+            time.sleep(0.2)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _write_arrow(df: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        feather.write_feather(df, tmp, compression="uncompressed")
+    except (pa.ArrowException, ValueError, TypeError):
+        # colunas com tipos misturados (ex.: número e texto) → texto
+        mixed = [c for c in df.columns if df[c].dtype == object
+                 and pd.api.types.infer_dtype(df[c], skipna=True).startswith("mixed")]
+        df = df.astype({c: str for c in mixed})
+        feather.write_feather(df, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+
+def read_manifest(root: Path = STORE_DIR) -> dict:
+    try:
+        with open(_paths(root)["manifest"], encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"version": 0, "current_version": 0, "exports": []}
+
+
+def _write_manifest(root: Path, manifest: dict) -> None:
+    path = _paths(root)["manifest"]
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def ingest(file_bytes: bytes, name: str, root: Path = STORE_DIR,
+           key_col: str = COL_CHAVE_CD, progress: Optional[ProgressFn] = None) -> dict:
+    """Ingere um export do ControleDiario. Exports já ingeridos (mesmo conteúdo)
+    são ignorados. Devolve o registro do export no manifesto."""
+    digest = parse_cache.content_hash(file_bytes)
+    p = _paths(root)
+    p["segments"].mkdir(parents=True, exist_ok=True)
+    p["changes"].mkdir(parents=True, exist_ok=True)
+
+    with _locked(root):
+        manifest = read_manifest(root)
+        for exp in manifest["exports"]:
+            if exp["hash"] == digest:
+                return {**exp, "ja_ingerido": True}
+
+        sheet = max(sheet_catalogue(file_bytes), key=lambda s: s["rows"])["name"]
+        df = parse_cache.load_sheet(digest, sheet)
+        if df is None:
+            df = read_sheet(file_bytes, sheet, progress=progress)
+        if key_col not in df.columns:
+            raise StoreError(f"Coluna-chave '{key_col}' não encontrada em {name}")
+        df = df[df[key_col].notna()].copy()
+        df[key_col] = df[key_col].astype(str).str.strip()
+        # mesma chave repetida no export: vale a última linha
+        df = df.drop_duplicates(subset=[key_col], keep="last").reset_index(drop=True)
+
+        seq = manifest["version"] + 1
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        _write_arrow(df, p["segments"] / f"{seq:06d}.arrow")
+
+        has_status = COL_STATUS in df.columns
+        new = pd.DataFrame({
+            "key": df[key_col].to_numpy(),
+            "status": df[COL_STATUS].astype(str).to_numpy() if has_status else None,
+            "seq": seq,
+            "row": range(len(df)),
+        })
+        if p["state"].exists():
+            state = feather.read_feather(p["state"], memory_map=True)
+        else:
+            state = pd.DataFrame({"key": pd.Series(dtype=str), "status": pd.Series(dtype=str),
+                                  "seq": pd.Series(dtype="int64"), "row": pd.Series(dtype="int64")})
+
+        prev = state.set_index("key")["status"]
+        prev_status = new["key"].map(prev)
+        is_new = ~new["key"].isin(prev.index)
+        if has_status:
+            changed = ~is_new & (prev_status != new["status"])
+        else:
+            # export sem a coluna de status: mantém o status conhecido e nada conta como alteração
+            new["status"] = prev_status.to_numpy()
+            changed = pd.Series(False, index=new.index)
+        changes = pd.DataFrame({
+            "Chave": new["key"][is_new | changed],
+            "Status anterior": prev_status[is_new | changed],
+            "Status novo": new["status"][is_new | changed],
+            "Export": name,
+            "Ingerido em": now,
+        })[CHANGE_COLUMNS]
+        if len(changes):
+            _write_arrow(changes.reset_index(drop=True), p["changes"] / f"{seq:06d}.arrow")
+
+        # estado: casos antigos que não vieram no export + versão nova dos que vieram
+        state = pd.concat([state[~state["key"].isin(new["key"])], new], ignore_index=True)
+        _write_arrow(state, p["state"])
+
+        record = {
+            "seq": seq, "nome": name, "hash": digest, "linhas": int(len(df)),
+            "casos_novos": int(is_new.sum()), "status_alterados": int(changed.sum()),
+            "ingerido_em": now,
+        }
+        manifest["exports"].append(record)
+        manifest["version"] = seq
+        _write_manifest(root, manifest)
+    return record
+
+
+def open_consolidated(root: Path = STORE_DIR) -> Optional[pd.DataFrame]:
+    """Versão mais recente de cada caso, ou None se a base estiver vazia."""
+    p = _paths(root)
+    manifest = read_manifest(root)
+    if not manifest["version"]:
+        return None
+    if manifest.get("current_version") == manifest["version"] and p["current"].exists():
+        return feather.read_feather(p["current"], memory_map=True)
+
+    with _locked(root):
+        manifest = read_manifest(root)
+        state = feather.read_feather(p["state"], columns=["seq", "row", "status"], memory_map=True)
+        state["_ord"] = range(len(state))
+        parts = []
+        for seq, grp in state.groupby("seq", sort=True):
+            seg = feather.read_feather(p["segments"] / f"{seq:06d}.arrow", memory_map=True)
+            part = seg.iloc[grp["row"].to_numpy()].set_axis(grp["_ord"].to_numpy())
+            if COL_STATUS not in part.columns:
+                # export sem a coluna de status: vale o último status conhecido (do estado)
+                part = part.assign(**{COL_STATUS: grp["status"].to_numpy()})
+            parts.append(part)
+        current = pd.concat(parts).sort_index().reset_index(drop=True)
+        _write_arrow(current, p["current"])
+        manifest["current_version"] = manifest["version"]
+        _write_manifest(root, manifest)
+    return current
+
+
+def change_log(root: Path = STORE_DIR) -> pd.DataFrame:
+    """Todas as mudanças de status registradas, da mais recente para a mais antiga."""
+    d = _paths(root)["changes"]
+    files = sorted(d.glob("*.arrow"), reverse=True) if d.is_dir() else []
+    if not files:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    return pd.concat([feather.read_feather(f) for f in files], ignore_index=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Base consolidada de exports ControleDiario.")
+    parser.add_argument("--store", default=str(STORE_DIR), help="Diretório da base")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_ing = sub.add_parser("ingest", help="Ingerir exports (arquivos ou diretórios)")
+    p_ing.add_argument("paths", nargs="+")
+    sub.add_parser("info", help="Resumo da base")
+    args = parser.parse_args(argv)
+    root = Path(args.store)
+
+    if args.cmd == "ingest":
+        files = []
+        for path in map(Path, args.paths):
+            if path.is_dir():
+                files += sorted(f for f in path.iterdir() if f.suffix.lower().lstrip(".") in SUPPORTED_EXTENSIONS)
+            else:
+                files.append(path)
+        for f in files:
+            rec = ingest(f.read_bytes(), f.name, root)
+            if rec.get("ja_ingerido"):
+                print(f"= {f.name}: já ingerido (export #{rec['seq']})")
+            else:
+                print(f"+ {f.name}: {rec['linhas']:,} linhas, {rec['casos_novos']:,} casos novos, "
+                      f"{rec['status_alterados']:,} status alterados")
+    else:
+        manifest = read_manifest(root)
+        print(f"{len(manifest['exports'])} export(s) ingerido(s) em {root}")
+        for exp in manifest["exports"]:
+            print(f"  #{exp['seq']:>4} {exp['ingerido_em']}  {exp['nome']}  ({exp['linhas']:,} linhas)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
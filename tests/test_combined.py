@@ -0,0 +1,78 @@
+"""Tabela Combinada paginada (analytics.join_index / combined_rows) contra o merge do pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from analytics import (  # noqa: E402
+    COL_CHAVE_CD, COL_CHAVE_HIST, combined_rows, encode_keys, join_index, sort_history, sort_index,
+)
+
+HIST_COLS = [COL_CHAVE_HIST, "Nome da Tarefa", "Criar hora"]
+
+
+def _frames():
+    rng = np.random.default_rng(7)
+    cd = pd.DataFrame({
+        COL_CHAVE_CD: [f"K{i}" for i in range(40)] + ["K1", "K2 ", "SEM"],
+        "Valor ME": np.where(rng.random(43) < 0.2, np.nan, rng.integers(0, 50, 43)),
+    })
+    n = 300
+    hist = pd.DataFrame({
+        COL_CHAVE_HIST: [f"K{k}" for k in rng.integers(0, 60, n)],
+        "Nome da Tarefa": rng.choice(["Abrir", "Analisar", "Fechar"], n),
+        "Criar hora": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10_000, n), unit="min"),
+    })
+    keys = encode_keys(cd, hist)
+    hist_sorted, keys, _ = sort_history(hist, keys=keys)
+    return cd, hist_sorted, keys
+
+
+def _reference(cd, hist_sorted, view_pos):
+    view = cd.iloc[view_pos].assign(_k=lambda d: d[COL_CHAVE_CD].str.strip())
+    return view.merge(hist_sorted[HIST_COLS].assign(_k=hist_sorted[COL_CHAVE_HIST].str.strip()),
+                      on="_k", how="left").drop(columns="_k")
+
+
+def _rows(df):
+    return sorted(df.astype(str).agg("|".join, axis=1))
+
+
+def test_join_index_intervals_match_sorted_history():
+    cd, hist_sorted, keys = _frames()
+    join = join_index(keys)
+    for code, key in enumerate(keys["chaves"]):
+        rows = np.flatnonzero(hist_sorted[COL_CHAVE_HIST].str.strip().to_numpy() == key)
+        assert join["counts"][code] == len(rows)
+        if len(rows):
+            assert join["starts"][code] == rows[0]
+            assert np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows)))
+
+
+@pytest.mark.parametrize("sort_col", [None, "Valor ME", "Criar hora"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_pages_match_pandas_merge(sort_col, ascending):
+    cd, hist_sorted, keys = _frames()
+    join = join_index(keys)
+    view_pos = np.flatnonzero(np.arange(len(cd)) % 3 != 1)
+    ref = _reference(cd, hist_sorted, view_pos)
+
+    sort_by = None
+    if sort_col is not None:
+        side, src = ("cd", cd) if sort_col in cd.columns else ("hist", hist_sorted)
+        sort_by = (side, *sort_index(src[sort_col]))
+    full, total = combined_rows(cd, view_pos, hist_sorted, HIST_COLS, join, 0, 10**9, sort_by, ascending)
+    assert total == len(ref) == len(full)
+    assert _rows(full[ref.columns]) == _rows(ref)
+    if sort_col is not None:
+        vals = full[sort_col].dropna()
+        assert vals.is_monotonic_increasing if ascending else vals.is_monotonic_decreasing
+        assert full[sort_col].isna().to_numpy()[len(vals):].all()
+
+    pages = [combined_rows(cd, view_pos, hist_sorted, HIST_COLS, join, s, s + 17, sort_by, ascending)[0]
+             for s in range(0, total, 17)]
+    pd.testing.assert_frame_equal(pd.concat(pages, ignore_index=True), full.reset_index(drop=True))
@@ -0,0 +1,66 @@
+"""Exportações em segundo plano (exports.py)."""
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import exports  # noqa: E402
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_DIR", tmp_path)
+    monkeypatch.setattr(exports, "_jobs", {})
+    return tmp_path
+
+
+def _frame(n=45):
+    return pd.DataFrame({"Chave": [f"K{i}" for i in range(n)], "Valor": [i * 1.5 for i in range(n)],
+                         "Data": pd.date_range("2024-01-01", periods=n, freq="h")})
+
+
+def _wait(job):
+    deadline = time.time() + 30
+    while job["status"] == "running" and time.time() < deadline:
+        time.sleep(0.02)
+    assert job["status"] == "done", job["error"]
+    return job
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_chunked_export_matches_frame(export_dir, fmt):
+    df = _frame()
+    key = exports.export_key("fp", {"filtro": 1}, fmt)
+    job = _wait(exports.submit(key, fmt, exports.frame_chunks(df, chunk_rows=10), len(df)))
+    assert job["rows_done"] == len(df) and exports.progress(job) == 1.0
+    back = pd.read_csv(job["path"], parse_dates=["Data"]) if fmt == "csv" else pd.read_excel(job["path"])
+    pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+
+def test_status_is_a_lookup(export_dir):
+    key = exports.export_key("fp", None, "csv")
+    assert exports.status(key, "csv") is None
+    assert exports._jobs == {}
+
+    # arquivo de uma execução anterior: aparece como pronto, sem registrar nem iniciar job
+    exports._path(key, "csv").write_text("a\n1\n")
+    job = exports.status(key, "csv")
+    assert job["status"] == "done" and job["path"] == exports._path(key, "csv")
+    assert exports._jobs == {}
+    assert exports.status(key, "csv")["finished"] == job["finished"]
+
+
+def test_same_request_reuses_the_file(export_dir):
+    df = _frame()
+    key = exports.export_key("fp", "f", "csv")
+    first = _wait(exports.submit(key, "csv", exports.frame_chunks(df), len(df)))
+    again = exports.submit(key, "csv", lambda: pytest.fail("não deveria gerar de novo"), len(df))
+    assert again is first
+
+    exports.evict(0)
+    assert exports.status(key, "csv") is None
+    _wait(exports.submit(key, "csv", exports.frame_chunks(df), len(df)))
@@ -0,0 +1,54 @@
+"""Ciclo de vida por caso (analytics.case_lifecycle) contra groupby caso a caso do pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from analytics import COL_CHAVE_HIST, LIFECYCLE_TASK_PREFIX, case_lifecycle  # noqa: E402
+
+
+def _history(n=500, seed=11):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        COL_CHAVE_HIST: rng.choice([f"C{i}" for i in range(80)], n),
+        "Nome da Tarefa": rng.choice(["Abrir", "Analisar", "Fechar"], n),
+        "Criar hora": pd.Timestamp("2024-05-01") + pd.to_timedelta(rng.permutation(n) * 13, unit="min"),
+        "Executante": rng.choice(["ana", "bia", "caio", None], n),
+    })
+    df.loc[rng.choice(n, 10, replace=False), COL_CHAVE_HIST] = None
+    return df
+
+
+def test_lifecycle_matches_groupby():
+    df = _history()
+    out = case_lifecycle(df).set_index("Operação").sort_index()
+
+    ref_df = df.dropna(subset=[COL_CHAVE_HIST]).sort_values([COL_CHAVE_HIST, "Criar hora"])
+    g = ref_df.groupby(COL_CHAVE_HIST)
+    gaps = g["Criar hora"].diff() / pd.Timedelta(hours=1)
+    ref = pd.DataFrame({
+        "Eventos": g.size(),
+        "Primeiro evento": g["Criar hora"].min(),
+        "Último evento": g["Criar hora"].max(),
+        "Primeira tarefa": g["Nome da Tarefa"].first(),
+        "Última tarefa": g["Nome da Tarefa"].last(),
+        "Duração total (h)": (g["Criar hora"].max() - g["Criar hora"].min()) / pd.Timedelta(hours=1),
+        "Maior intervalo (h)": gaps.groupby(ref_df[COL_CHAVE_HIST]).max(),
+        "Intervalo médio (h)": gaps.groupby(ref_df[COL_CHAVE_HIST]).mean(),
+        "Executantes distintos": g["Executante"].nunique(),
+    })
+    pd.testing.assert_frame_equal(out[ref.columns], ref, check_names=False, check_dtype=False)
+
+    per_task = pd.crosstab(ref_df[COL_CHAVE_HIST], ref_df["Nome da Tarefa"])
+    for task in per_task.columns:
+        assert out[f"{LIFECYCLE_TASK_PREFIX}{task}"].tolist() == per_task[task].tolist()
+
+
+def test_single_event_case_has_no_gaps():
+    df = _history().iloc[:1]
+    out = case_lifecycle(df)
+    assert out["Eventos"].tolist() == [1] and out["Duração total (h)"].tolist() == [0.0]
+    assert out["Maior intervalo (h)"].isna().all()
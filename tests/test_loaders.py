@@ -0,0 +1,52 @@
+"""Leitura das planilhas em loaders: CSV pt-BR (";" e vírgula decimal) e XLSB (calamine)."""
+import datetime as dt
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import loaders  # noqa: E402
+from loaders import read_sheet  # noqa: E402
+
+
+def _csv(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+def test_ptbr_numbers_are_converted():
+    df = read_sheet(_csv("Valor;Qtd\n1.234,56;1.000\n-12;7\n0,5;12\n"))
+    assert df["Valor"].tolist() == [1234.56, -12.0, 0.5]
+    assert df["Qtd"].tolist() == [1000, 7, 12]
+
+
+def test_dotted_text_stays_text():
+    df = read_sheet(_csv(
+        "Doc;ID;Versao\n"
+        "01.02.2024;123.456.789-00;1.2.3\n"
+        "15.03.2024;987.654.321-99;10.0.1\n"
+    ))
+    assert df["Doc"].tolist() == ["01.02.2024", "15.03.2024"]
+    assert df["ID"].tolist() == ["123.456.789-00", "987.654.321-99"]
+    assert df["Versao"].tolist() == ["1.2.3", "10.0.1"]
+
+
+def test_mixed_column_stays_text():
+    df = read_sheet(_csv("Codigo;Valor\n1.234;1,5\nABC.1;2,5\n"))
+    assert df["Codigo"].tolist() == ["1.234", "ABC.1"]
+    assert df["Valor"].tolist() == [1.5, 2.5]
+
+
+def test_calamine_midnight_cells_keep_datetime_dtype():
+    # o calamine devolve datetime.date para horários de meia-noite
+    src = pd.DataFrame({"Criar hora": [dt.datetime(2024, 1, 2, 10, 5), dt.datetime(2024, 1, 3)],
+                        "Dia": [dt.datetime(2024, 1, 2), dt.datetime(2024, 1, 3)]})
+    buf = io.BytesIO()
+    src.to_excel(buf, index=False)
+    wb = loaders._calamine_workbook(buf.getvalue())
+    df = loaders._read_xlsb_sheet(wb, wb.sheet_names[0], None, loaders.CHUNK_ROWS)
+    expected = pd.read_excel(io.BytesIO(buf.getvalue()))
+    assert df["Criar hora"].dtype == "datetime64[ns]"
+    pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,42 @@
+"""Cache em disco das planilhas lidas (parse_cache.py)."""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import parse_cache  # noqa: E402
+
+
+def test_partial_saves_add_sheets_without_rewriting(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", tmp_path)
+    a = pd.DataFrame({"x": [1, 2], "y": ["a", "b"]})
+    b = pd.DataFrame({"z": [0.5]})
+    parse_cache.save_sheets("k", {"A": a}, complete=False)
+    entry = parse_cache._entry_dir("k")
+    first = entry / parse_cache._sheet_file("A")
+    inode = first.stat().st_ino
+
+    parse_cache.save_sheets("k", {"A": a, "B": b}, complete=False)
+    assert first.stat().st_ino == inode
+    pd.testing.assert_frame_equal(parse_cache.load_sheet("k", "A"), a)
+    pd.testing.assert_frame_equal(parse_cache.load_sheet("k", "B"), b)
+    assert parse_cache.load_workbook("k") is None
+    assert sorted(p.name for p in entry.iterdir() if p.name.startswith(".")) == []
+
+    parse_cache.save_sheets("k", {"A": a, "B": b})
+    assert list(parse_cache.load_workbook("k")) == ["A", "B"]
+
+
+def test_entries_of_another_parser_version_are_not_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", tmp_path)
+    parse_cache.save_sheets("k", {"A": pd.DataFrame({"x": [1]})})
+    monkeypatch.setattr(parse_cache, "PARSER_VERSION", parse_cache.PARSER_VERSION + 1)
+    assert parse_cache.load_sheet("k", "A") is None
+
+
+def test_uncacheable_sheet_leaves_no_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", tmp_path)
+    parse_cache.save_sheets("k", {"A": pd.DataFrame({"x": [1, "a"]})})
+    assert not parse_cache._entry_dir("k").exists()
@@ -0,0 +1,69 @@
+"""Mapa de processo (analytics.process_map) contra uma referência em pandas puro."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import analytics  # noqa: E402
+from analytics import COL_CHAVE_HIST, PROCESS_END, PROCESS_START, process_map  # noqa: E402
+
+
+def _history(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        COL_CHAVE_HIST: rng.choice([f"C{i}" for i in range(60)], n),
+        "Nome da Tarefa": rng.choice(["Abrir", "Analisar", "Aprovar", "Fechar"], n, p=[.3, .3, .2, .2]),
+        "Criar hora": pd.Timestamp("2024-03-01") + pd.to_timedelta(rng.permutation(n) * 7, unit="min"),
+    })
+
+
+def _reference(df):
+    df = df.sort_values([COL_CHAVE_HIST, "Criar hora"], kind="stable")
+    paths = df.groupby(COL_CHAVE_HIST, sort=False)["Nome da Tarefa"].agg(" → ".join)
+    prev = df.groupby(COL_CHAVE_HIST)["Nome da Tarefa"].shift()
+    prev_t = df.groupby(COL_CHAVE_HIST)["Criar hora"].shift()
+    inner = pd.DataFrame({"De": prev, "Para": df["Nome da Tarefa"], "Caso": df[COL_CHAVE_HIST],
+                          "h": (df["Criar hora"] - prev_t) / pd.Timedelta(hours=1)}).dropna(subset=["De"])
+    firsts = df.groupby(COL_CHAVE_HIST)["Nome da Tarefa"]
+    edges = pd.concat([
+        inner,
+        pd.DataFrame({"De": PROCESS_START, "Para": firsts.first(), "Caso": firsts.first().index, "h": np.nan}),
+        pd.DataFrame({"De": firsts.last(), "Para": PROCESS_END, "Caso": firsts.last().index, "h": np.nan}),
+    ])
+    trans = edges.groupby(["De", "Para"]).agg(**{
+        "Transições": ("Caso", "size"), "Casos": ("Caso", "nunique"), "Mediana (h)": ("h", "median")})
+    return trans, paths.value_counts()
+
+
+def test_transitions_and_variants_match_reference():
+    df = _history()
+    out = process_map(df)
+    trans, variants = _reference(df)
+    got = out["transicoes"].set_index(["De", "Para"]).sort_index()
+    assert got.index.equals(trans.index)
+    assert got["Transições"].tolist() == trans["Transições"].tolist()
+    assert got["Casos"].tolist() == trans["Casos"].tolist()
+    pd.testing.assert_series_equal(got["Mediana (h)"], trans["Mediana (h)"].round(2), check_names=False)
+
+    assert out["n_variantes"] == len(variants)
+    got_v = out["variantes"].set_index("Variante")["Casos"]
+    assert got_v.to_dict() == variants.loc[got_v.index].to_dict()
+    assert got_v.tolist() == sorted(variants.to_numpy(), reverse=True)[:len(got_v)]
+
+
+def test_hash_collisions_do_not_merge_paths(monkeypatch):
+    df = _history()
+    expected = process_map(df)
+    # todo caminho com o mesmo hash: só a conferência exata separa as variantes
+    monkeypatch.setattr(analytics, "_path_hash", lambda codes, pos, starts: np.zeros(len(starts), np.uint64))
+    out = process_map(df)
+    assert out["n_variantes"] == expected["n_variantes"]
+    pd.testing.assert_frame_equal(out["variantes"], expected["variantes"])
+
+
+def test_empty_history():
+    out = process_map(_history().iloc[:0])
+    assert out["n_variantes"] == 0 and out["transicoes"].empty and out["variantes"].empty
@@ -0,0 +1,40 @@
+"""Perfil de colunas (profiler.py) contra as contagens exatas do pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import profiler  # noqa: E402
+from profiler import hll_distinct, profile_columns  # noqa: E402
+
+
+def test_min_max_keep_the_column_type():
+    df = pd.DataFrame({"Inteiro": [3, 1, 2], "Real": [1.5, np.nan, 2.0], "Texto": ["a", None, "b"],
+                       "Data": pd.to_datetime(["2024-01-02", None, "2024-01-01"])})
+    out = profile_columns(df).set_index("Coluna")
+    assert out.loc["Inteiro", ["Mínimo", "Máximo"]].tolist() == ["1", "3"]
+    assert out.loc["Real", ["Mínimo", "Máximo"]].tolist() == ["1.5", "2.0"]
+    assert out.loc["Texto", ["Mínimo", "Máximo"]].tolist() == ["", ""]
+    assert out.loc["Data", "Mínimo"] == "2024-01-01 00:00:00"
+    assert out["Nulos"].tolist() == df.isna().sum().tolist()
+    assert not out["Únicos aprox."].any()
+    assert out["Únicos"].tolist() == df.nunique().tolist()
+
+
+def test_large_columns_are_estimated_and_flagged(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_EXACT_ROWS", 1_000)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"Chave": rng.integers(0, 20_000, 50_000).astype(str),
+                       "Cat": pd.Categorical(rng.choice(["x", "y"], 50_000))})
+    out = profile_columns(df).set_index("Coluna")
+    exact = df["Chave"].nunique()
+    assert out.loc["Chave", "Únicos aprox."]
+    assert abs(out.loc["Chave", "Únicos"] - exact) / exact < 0.03
+    assert not out.loc["Cat", "Únicos aprox."] and out.loc["Cat", "Únicos"] == 2
+
+
+def test_hll_small_cardinalities():
+    assert hll_distinct(pd.Series(["a", "b", "a", "c"])) == 3
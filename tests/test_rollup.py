@@ -0,0 +1,60 @@
+"""Cubo de contagens por período (analytics.build_rollup / rollup_series) contra o resample do pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from analytics import build_rollup, rollup_extent, rollup_level, rollup_series  # noqa: E402
+
+FREQ = {"Minuto": "min", "Hora": "h", "Dia": "D", "Mês": "MS"}
+
+
+def _events(n=3_000, seed=2):
+    rng = np.random.default_rng(seed)
+    t = pd.Series(pd.Timestamp("2024-01-15") + pd.to_timedelta(rng.integers(0, 200 * 24 * 60, n), unit="min")
+                  + pd.to_timedelta(rng.integers(0, 60, n), unit="s"))
+    t[rng.choice(n, 20, replace=False)] = pd.NaT
+    return t, pd.Series(rng.choice(["Abrir", "Fechar", None], n))
+
+
+def _reference(t, g, freq):
+    df = pd.DataFrame({"t": t, "g": g}).dropna()
+    return (df.groupby([df["t"].dt.to_period(freq.replace("MS", "M")).dt.start_time, "g"]).size()
+            .rename("Eventos").rename_axis(["Período", "Grupo"]).reset_index())
+
+
+@pytest.mark.parametrize("level", ["Minuto", "Hora", "Dia", "Mês"])
+def test_every_level_matches_groupby(level):
+    t, g = _events()
+    cube = build_rollup(t, g)
+    out, got_level = rollup_series(cube, level=level)
+    assert got_level == level
+    ref = _reference(t, g, FREQ[level])
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), ref, check_dtype=False)
+
+
+def test_window_and_automatic_level():
+    t, g = _events()
+    cube = build_rollup(t, g)
+    first, last = rollup_extent(cube)
+    counted = t[g.notna()]   # eventos sem grupo ficam fora do cubo
+    assert first == counted.min().floor("min") and last == counted.max().floor("min")
+
+    start, end = pd.Timestamp("2024-03-10 12:00"), pd.Timestamp("2024-03-11 18:00")
+    out, level = rollup_series(cube, start, end)
+    assert level == rollup_level(start, end) == "Hora"
+    ref = _reference(t, g, "h")
+    ref = ref[(ref["Período"] >= start.floor("h")) & (ref["Período"] <= end)]
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), ref.reset_index(drop=True), check_dtype=False)
+
+
+def test_total_without_groups_and_empty():
+    t, _ = _events()
+    out, _ = rollup_series(build_rollup(t), level="Dia")
+    assert out["Eventos"].sum() == t.notna().sum() and set(out["Grupo"]) == {"Total"}
+    empty, _ = rollup_series(build_rollup(pd.Series([], dtype="datetime64[ns]")))
+    assert empty.empty
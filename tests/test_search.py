@@ -0,0 +1,42 @@
+"""Busca por trigramas e sugestões de chave (search.py)."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from search import build_key_index, build_search_index, prefix_search, search  # noqa: E402
+
+
+def _index():
+    df = pd.DataFrame({"ID": ["P-283", "P-284", "X-1"],
+                       "Razão Social": ["São José Ltda", "Câmbio Sul", None]})
+    return build_search_index(df, ["ID", "Razão Social"])
+
+
+def test_search_ignores_case_and_accents():
+    assert search(_index(), "SAO jos").tolist() == [0]
+    assert search(_index(), "p-28").tolist() == [0, 1]
+
+
+def test_blank_term_returns_everything():
+    assert search(_index(), "   ").tolist() == [0, 1, 2]
+
+
+def test_term_that_folds_to_nothing_finds_nothing():
+    assert search(_index(), "🔎").tolist() == []
+    assert search(_index(), " ́ ").tolist() == []
+
+
+def test_key_index_keeps_key_type_and_matches_hyphen_parts():
+    index = build_key_index(pd.Series([30, 4, 30]))
+    assert index["keys"].tolist() == [30, 4]
+    assert isinstance(index["keys"][0], (int, np.integer))
+    assert index["keys"][prefix_search(index, "4")[0]].tolist() == [4]
+
+    index = build_key_index(["CB-OPS-WORK P-28304", "CB-OPS-WORK P-11", "Outra"])
+    assert index["keys"][prefix_search(index, "ops")[0]].tolist() == ["CB-OPS-WORK P-11", "CB-OPS-WORK P-28304"]
+    assert index["keys"][prefix_search(index, "p-283")[0]].tolist() == ["CB-OPS-WORK P-28304"]
+    assert index["keys"][prefix_search(index, "283")[0]].tolist() == ["CB-OPS-WORK P-28304"]
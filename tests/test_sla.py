@@ -0,0 +1,58 @@
+"""SLA por caso (analytics.case_sla) contra uma referência caso a caso em pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from analytics import COL_CHAVE_HIST, SLA_DEADLINE, SLA_EXECUTE, SLA_GOAL, case_sla, sla_breaches  # noqa: E402
+
+
+def _history(n=600, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        COL_CHAVE_HIST: rng.choice([f"C{i}" for i in range(90)], n),
+        "Nome da Tarefa": rng.choice(["Abrir", SLA_EXECUTE, SLA_GOAL, SLA_DEADLINE], n, p=[.4, .2, .2, .2]),
+        "Criar hora": pd.Timestamp("2024-06-01") + pd.to_timedelta(rng.permutation(n) * 11, unit="min"),
+        "Executante": rng.choice(["ana", "bia", "caio"], n),
+        "Tipo de Caso/Suporte": rng.choice(["A", "B"], n),
+    })
+
+
+def _reference(df):
+    rows = {}
+    for key, case in df.sort_values("Criar hora").groupby(COL_CHAVE_HIST):
+        first = {name: case[case["Nome da Tarefa"] == name].head(1) for name in (SLA_EXECUTE, SLA_GOAL, SLA_DEADLINE)}
+        when = {name: f["Criar hora"].iloc[0] if len(f) else pd.NaT for name, f in first.items()}
+        opened = case["Criar hora"].iloc[0]
+        goal, dead = when[SLA_GOAL], when[SLA_DEADLINE]
+        rows[key] = {
+            "Tipo de Caso/Suporte": case["Tipo de Caso/Suporte"].iloc[0],
+            "Abertura": opened,
+            "Horas até ExecuteSLA": (when[SLA_EXECUTE] - opened) / pd.Timedelta(hours=1),
+            "Meta antes do prazo": pd.notna(goal) and (pd.isna(dead) or goal < dead),
+            "Prazo estourado": pd.notna(dead) and (pd.isna(goal) or dead <= goal),
+            "Executante no prazo": first[SLA_DEADLINE]["Executante"].iloc[0] if len(first[SLA_DEADLINE]) else None,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def test_sla_matches_per_case_reference():
+    df = _history()
+    out = case_sla(df).set_index("Operação").sort_index()
+    ref = _reference(df)
+    assert out.index.tolist() == ref.index.tolist()
+    for col in ref.columns:
+        got, exp = out[col], ref[col]
+        if col == "Executante no prazo":
+            got, exp = got.fillna("—"), exp.fillna("—")
+        pd.testing.assert_series_equal(got, exp, check_names=False, check_dtype=False)
+
+
+def test_breaches_by_executor_sum_to_totals():
+    sla = case_sla(_history())
+    by_exec = sla_breaches(sla.dropna(subset=["Executante no prazo"]), "Executante no prazo")
+    assert by_exec["Estouros"].sum() == int(sla["Prazo estourado"].sum())
+    assert by_exec["Casos"].sum() == int(sla["Executante no prazo"].notna().sum())
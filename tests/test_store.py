@@ -0,0 +1,76 @@
+"""Base consolidada de exports (store.py): estado, tabela consolidada e log de status."""
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import store  # noqa: E402
+from analytics import COL_CHAVE_CD  # noqa: E402
+
+
+def _xlsx(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def _export(keys, status=None, valor=None) -> pd.DataFrame:
+    df = pd.DataFrame({COL_CHAVE_CD: keys, "Valor": valor or list(range(len(keys)))})
+    if status is not None:
+        df[store.COL_STATUS] = status
+    return df
+
+
+def _log_rows(log: pd.DataFrame) -> list:
+    cols = ["Chave", "Status anterior", "Status novo", "Export"]
+    return log[cols].astype(object).where(log[cols].notna(), None).values.tolist()
+
+
+def test_latest_version_of_each_case(tmp_path):
+    e1 = _export(["A", "B", "C"], ["Aberto", "Aberto", "Pendente"], [1, 2, 3])
+    e2 = _export(["B", "C", "D"], ["Resolvido", "Pendente", "Aberto"], [20, 30, 40])
+    b2 = _xlsx(e2)
+    r1 = store.ingest(_xlsx(e1), "e1.xlsx", root=tmp_path)
+    r2 = store.ingest(b2, "e2.xlsx", root=tmp_path)
+    assert (r1["casos_novos"], r1["status_alterados"]) == (3, 0)
+    assert (r2["casos_novos"], r2["status_alterados"]) == (1, 1)
+    assert store.ingest(b2, "copia.xlsx", root=tmp_path)["ja_ingerido"]
+
+    # referência: concatena os exports em ordem e fica com a última linha de cada chave
+    ref = (pd.concat([e1, e2]).drop_duplicates(COL_CHAVE_CD, keep="last")
+           .sort_values(COL_CHAVE_CD).reset_index(drop=True))
+    cur = store.open_consolidated(tmp_path).sort_values(COL_CHAVE_CD).reset_index(drop=True)
+    pd.testing.assert_frame_equal(cur[ref.columns], ref, check_dtype=False)
+
+    log = store.change_log(tmp_path)
+    assert _log_rows(log) == [
+        ["B", "Aberto", "Resolvido", "e2.xlsx"],
+        ["D", None, "Aberto", "e2.xlsx"],
+        ["A", None, "Aberto", "e1.xlsx"],
+        ["B", None, "Aberto", "e1.xlsx"],
+        ["C", None, "Pendente", "e1.xlsx"],
+    ]
+
+
+def test_export_without_status_keeps_last_status(tmp_path):
+    e1 = _export(["A", "B"], ["Aberto", "Pendente"])
+    e2 = _export(["B", "C"], valor=[5, 6])
+    store.ingest(_xlsx(e1), "e1.xlsx", root=tmp_path)
+    rec = store.ingest(_xlsx(e2), "e2.xlsx", root=tmp_path)
+    assert (rec["casos_novos"], rec["status_alterados"]) == (1, 0)
+
+    cur = store.open_consolidated(tmp_path).set_index(COL_CHAVE_CD)
+    assert cur.loc["A", store.COL_STATUS] == "Aberto"
+    assert cur.loc["B", store.COL_STATUS] == "Pendente"
+    assert cur.loc["B", "Valor"] == 5
+    assert pd.isna(cur.loc["C", store.COL_STATUS])
+
+    # C é caso novo (sem status); B não conta como alteração
+    assert _log_rows(store.change_log(tmp_path)) == [
+        ["C", None, None, "e2.xlsx"],
+        ["A", None, "Aberto", "e1.xlsx"],
+        ["B", None, "Pendente", "e1.xlsx"],
+    ]